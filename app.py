@@ -9,6 +9,10 @@ from controllers.user_controller import UserController
 from controllers.download_controller import DownloadController
 from controllers.playlist_controller import PlayListController
 from database.connection import setup_database
+from services.deezer_service import deezer_executor, arl_pool
+from services.deezer_api import deezer_api
+from services.spotify_api import spotify_api
+from utils.file_handler import transcode_executor
 from routes.command_routes import setup_command_routes
 from routes.message_routes import setup_message_routes
 from routes.callback_routes import setup_callback_routes
@@ -86,6 +90,15 @@ class MusicDownloaderBot:
             # Initialize database
             setup_database()
             logger.info("Database initialized successfully")
+
+            # Continue album/playlist downloads interrupted by the last shutdown
+            self.resume_task = asyncio.create_task(self.download_controller.resume_jobs())
+
+            # Pre-download trending content during off-peak hours
+            self.warm_task = asyncio.create_task(self.download_controller.run_cache_warmer())
+
+            # Log quarantined Deezer sessions back in once their quarantine is over
+            self.arl_health_task = asyncio.create_task(arl_pool.run_health_checks())
             
             # Start polling
             logger.info("Starting bot polling...")
@@ -118,9 +131,14 @@ async def main():
             try:
                 await bot_instance.bot.session.close()
                 logger.info("Bot session closed successfully")
+                await deezer_api.close()
+                await spotify_api.close()
             except Exception as e:
                 logger.error(f"Error during session cleanup: {str(e)}", exc_info=True)
 
+        deezer_executor.shutdown()
+        transcode_executor.shutdown()
+
 if __name__ == "__main__":
     try:
         logger.info("Application starting")
@@ -1,25 +1,68 @@
 import aiogram
+import asyncio
 import os
+import shutil
+from datetime import datetime
+from types import SimpleNamespace
 from models.download_model import DownloadModel
 from models.user_model import UserModel
+from models.job_model import JobModel
 from services.deezer_service import DeezerService
 from services.spotify_service import SpotifyService
 from utils.file_handler import FileHandler
-from utils.url_validator import URLValidator
-from aiogram.types import FSInputFile
+from utils.url_validator import URLValidator, sanitize_filename
+from utils.single_flight import SingleFlight
+from aiogram.types import FSInputFile, InputMediaAudio, InputMediaDocument
 from bot import bot
 from logger import get_logger
 
 logger = get_logger(__name__)
 
+# Number of tracks of an album/playlist downloaded at the same time
+DOWNLOAD_WORKERS = int(os.getenv('DOWNLOAD_WORKERS', '4'))
+# Number of downloaded tracks allowed to wait for upload, caps temp disk usage
+PREFETCH_TRACKS = int(os.getenv('PREFETCH_TRACKS', '8'))
+# Send already cached tracks as media groups (Telegram allows up to 10 audios per group)
+MEDIA_GROUP_DELIVERY = os.getenv('MEDIA_GROUP_DELIVERY', 'true').lower() == 'true'
+MEDIA_GROUP_SIZE = 10
+# Largest ZIP sent as one document, bigger archives are split into volumes
+# (the public Bot API accepts uploads up to 50 MB, a local Bot API server up to 2000 MB)
+ZIP_VOLUME_BYTES = int(os.getenv('ZIP_VOLUME_BYTES', str(49 * 1024 * 1024)))
+# Number of ZIP volumes uploaded at the same time
+ZIP_UPLOAD_WORKERS = int(os.getenv('ZIP_UPLOAD_WORKERS', '3'))
+# Resume attempts before an interrupted download job is given up
+MAX_JOB_ATTEMPTS = int(os.getenv('MAX_JOB_ATTEMPTS', '3'))
+# Jobs older than this (hours) are given up instead of resumed, the user has moved on by then
+JOB_MAX_AGE_HOURS = int(os.getenv('JOB_MAX_AGE_HOURS', '24'))
+# Cached qualities (best first) a missing quality can be transcoded from instead of downloaded
+TRANSCODE_SOURCES = {
+    'MP3_128': ['FLAC', 'MP3_320'],
+    'MP3_320': ['FLAC']
+}
+# Chat (e.g. a private channel) that warmed content is uploaded to, warming is off when unset
+CACHE_CHAT_ID = os.getenv('CACHE_CHAT_ID')
+# Off-peak hours (server time, "start-end", may wrap past midnight) in which the cache is warmed
+WARM_HOURS = os.getenv('WARM_HOURS', '2-6')
+# Qualities every trending item is warmed in
+WARM_QUALITIES = [quality.strip() for quality in os.getenv('WARM_QUALITIES', 'MP3_128,MP3_320,FLAC').split(',') if quality.strip()]
+# Seconds between warming rounds and the most items downloaded per round
+WARM_INTERVAL = int(os.getenv('WARM_INTERVAL', '900'))
+WARM_BATCH = int(os.getenv('WARM_BATCH', '20'))
+# Only content downloaded at least this often in the last WARM_DAYS days is warmed
+WARM_MIN_DOWNLOADS = int(os.getenv('WARM_MIN_DOWNLOADS', '3'))
+WARM_DAYS = int(os.getenv('WARM_DAYS', '7'))
+
 class DownloadController:
     def __init__(self):
         self.download_model = DownloadModel()
         self.user_model = UserModel()
+        self.job_model = JobModel()
         self.deezer_service = DeezerService()
         self.spotify_service = SpotifyService()
         self.file_handler = FileHandler()
         self.url_validator = URLValidator()
+        # In-flight downloads keyed by (deezer_id, content_type, quality)
+        self.download_flights = SingleFlight('download')
         logger.info("DownloadController initialized")
 
     async def search(self, query: str, search_type: str, page: int = 1) -> tuple[bool, list]:
@@ -81,6 +124,28 @@ class DownloadController:
             logger.error(f"Error getting item info for {content_type} {item_id}: {str(e)}", exc_info=True)
             return False, {}
 
+    async def get_artist_section(self, artist_id: str, section: str, page: int = 1) -> tuple[bool, dict]:
+        """
+        Get one page of an artist card section (top tracks, albums or related artists)
+
+        Args:
+            artist_id (str): Spotify ID of the artist
+            section (str): 'top_tracks', 'album' or 'related'
+            page (int): 1-based page number
+
+        Returns:
+            tuple[bool, dict]: Success status and {'artist_name', 'items', 'has_more'}
+        """
+        try:
+            logger.info(f"Getting {section} page {page} of artist {artist_id}")
+            result = await self.spotify_service.get_artist_section(artist_id, section, page)
+            result['artist_name'] = self.spotify_service.get_cached_artist_name(artist_id)
+            return True, result
+
+        except Exception as e:
+            logger.error(f"Error getting {section} of artist {artist_id}: {str(e)}", exc_info=True)
+            return False, {}
+
     async def process_download_request(self, user_id, url):
         """Process download request from user"""
         try:
@@ -98,20 +163,26 @@ class DownloadController:
 
             # Convert Spotify URL to Deezer if needed
             if "spotify" in url:
-                if 'playlist' in url:
-                    logger.error(f"Spotify playlist not supported: {url}")
-                    return False, "Spotify playlists are not supported yet. Please use a Deezer link."
+                # Route on the parsed type: track/album links can carry a playlist context parameter
+                spotify_info = self.deezer_service.extract_spotify_info(url)
+                if spotify_info and spotify_info[0] == 'playlist':
+                    return await self._process_spotify_playlist(user_id, spotify_info[1], quality)
                 logger.info(f"Converting Spotify URL to Deezer URL: {url}")
-                url = self.deezer_service.convert_to_deezer(url)
+                url = await self.deezer_service.convert_to_deezer(url)
                 logger.info(f"Converted to Deezer URL: {url}")
 
             content_type, deezer_id = self.deezer_service.extract_info_from_url(url)
             logger.info(f"Extracted info - Type: {content_type}, ID: {deezer_id}")
 
+            # This request delivers the whole content again, so an older interrupted job for it is done
+            if content_type != 'track':
+                self.job_model.finish_user_jobs(user_id, deezer_id, content_type)
+
             if make_zip and 'track' not in url:
                 existing_zip = self.download_model.get_track_by_deezer_id_quality(user_id, deezer_id, quality)
                 if existing_zip:
                     logger.info(f"Found existing ZIP for {content_type} {deezer_id}")
+                    self.download_model.update_download_count(deezer_id, content_type)
                     await bot.send_document(
                         chat_id=user_id,
                         document=existing_zip['file_id'],
@@ -119,170 +190,885 @@ class DownloadController:
                     )
                     return True, "Sent existing ZIP file"
 
-                logger.info(f"Downloading {content_type} as ZIP: {deezer_id}")
-                smart = await self.deezer_service.download(url, quality_download=quality, make_zip=True)
-                
-                if smart.album:
-                    logger.info(f"Processing album download: {smart.album.title}")
-                    file_path = smart.album.zip_path
-                    document = FSInputFile(file_path)
-                    sent_message = await bot.send_document(
-                        chat_id=user_id, 
-                        document=document, 
-                        caption=f"@Spotizer_bot 🎧"
-                    )
-                    
-                    self.download_model.add_track(
-                        user_id=user_id,
-                        deezer_id=deezer_id,
-                        content_type='album',
-                        file_id=sent_message.document.file_id,
-                        quality=quality,
-                        url=url,
-                        title=smart.album.title,
-                        artist=smart.album.artist,
-                        album=smart.album.title
-                    )
-                    
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                        logger.info(f"Deleted album ZIP file: {file_path}")
-                    
-                elif smart.playlist:
-                    logger.info(f"Processing playlist download: {smart.playlist.title}")
-                    file_path = smart.playlist.zip_path
-                    document = FSInputFile(file_path)
-                    sent_message = await bot.send_document(
-                        chat_id=user_id, 
-                        document=document, 
-                        caption=f"@Spotizer_bot 🎧"
-                    )
-                    
-                    self.download_model.add_track(
-                        user_id=user_id,
-                        deezer_id=deezer_id,
-                        content_type='playlist',
-                        file_id=sent_message.document.file_id,
-                        quality=quality,
-                        url=url,
-                        title=smart.playlist.title,
-                        artist=smart.playlist.artist,
-                        album='album.title'
-                    )
-                    
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                        logger.info(f"Deleted playlist ZIP file: {file_path}")
+                existing_volumes = self.download_model.get_archive_volumes(deezer_id, content_type, quality)
+                if existing_volumes:
+                    logger.info(f"Found existing {len(existing_volumes)}-volume ZIP for {content_type} {deezer_id}")
+                    self.download_model.update_download_count(deezer_id, content_type)
+                    await self._send_cached_volumes(user_id, existing_volumes)
+                    return True, "Sent existing ZIP file"
+
+                key = (deezer_id, content_type, quality)
+                zip_record = await self.download_flights.do(
+                    key, self._download_zip, user_id, url, content_type, deezer_id, quality
+                )
+                if zip_record and zip_record['user_id'] != user_id:
+                    logger.info(f"Reusing ZIP uploaded for another request: {content_type} {deezer_id}")
+                    await self._send_cached_volumes(user_id, zip_record['file_ids'])
             else:
                 logger.info(f"Processing individual tracks for {content_type} {deezer_id}")
-                track_ids = await self.deezer_service.get_track_list(content_type, deezer_id)
-                musics_playlist = []
+                track_pages = self.deezer_service.iter_track_pages(content_type, deezer_id)
+
+                # Album/playlist downloads are checkpointed so they can be resumed after a restart,
+                # their tracks are added to the job page by page
+                job_id = None
+                if content_type != 'track':
+                    job_id = self.job_model.create_job(user_id, deezer_id, content_type, quality, [])
+
+                try:
+                    success, musics_playlist = await self._process_tracks(
+                        user_id, track_pages, quality, (content_type, deezer_id, quality),
+                        job_id=job_id, add_to_job=True
+                    )
+                except Exception:
+                    # Failed in this process, not interrupted: nothing to resume after a restart
+                    if job_id:
+                        self.job_model.finish_job(job_id, 'failed')
+                    raise
+                if not success:
+                    if job_id:
+                        self.job_model.finish_job(job_id, 'failed')
+                    return False, "An error occurred while processing your download request."
+
+                await self._send_m3u(user_id, deezer_id, musics_playlist)
+                if job_id:
+                    self.job_model.finish_job(job_id)
+
+            return True, "Download completed successfully"
+
+        except Exception as e:
+            logger.error(f"Download processing error: {str(e)}", exc_info=True)
+            return False, "An error occurred while processing your download request."
+
+    async def _process_spotify_playlist(self, user_id, playlist_id, quality):
+        """
+        Deliver a Spotify playlist as individual tracks
+
+        Tracks are converted to Deezer concurrently and fed into the track
+        pipeline as they resolve, so delivery starts before the whole
+        playlist is converted. ZIP delivery does not apply since the tracks
+        come from many Deezer albums.
+        """
+        logger.info(f"Processing Spotify playlist {playlist_id} for user {user_id}")
+        track_pages = self.deezer_service.iter_spotify_playlist_pages(playlist_id)
+        success, musics_playlist = await self._process_tracks(
+            user_id, track_pages, quality, ('spotify_playlist', playlist_id, quality)
+        )
+        if not success:
+            return False, "An error occurred while processing your download request."
+
+        await self._send_m3u(user_id, playlist_id, musics_playlist)
+        return True, "Download completed successfully"
+
+    async def _send_m3u(self, user_id, deezer_id, musics_playlist):
+        """Send an M3U playlist file for multi-track downloads"""
+        if len(musics_playlist) > 1:
+            filename = f'deezer_{deezer_id}.m3u'
+            logger.info(f"Creating playlist file: {filename}")
+            await self.file_handler.playlist_creator(musics_playlist, filename)
+            
+            await bot.send_document(
+                chat_id=user_id,
+                document=FSInputFile(filename),
+                caption="<a href='https://telegra.ph/How-to-Use-M3U-Playlists-03-02'>What is this and how can I use it?</a>\n\n@Spotizer_bot 🎧",
+                parse_mode='HTML'
+            )
+            
+            if os.path.exists(filename):
+                os.remove(filename)
+                logger.info(f"Deleted playlist file: {filename}")
+
+    async def resume_jobs(self):
+        """Continue album/playlist downloads that were interrupted, e.g. by a restart"""
+        try:
+            self.job_model.expire_jobs(JOB_MAX_AGE_HOURS)
+            jobs = self.job_model.get_unfinished_jobs()
+            logger.info(f"Resuming {len(jobs)} unfinished download jobs")
+            for job in jobs:
+                try:
+                    await self._resume_job(job)
+                except Exception as e:
+                    logger.error(f"Error resuming download job {job['job_id']}: {str(e)}", exc_info=True)
+        except Exception as e:
+            logger.error(f"Error resuming download jobs: {str(e)}", exc_info=True)
+
+    async def _resume_job(self, job):
+        """Deliver the remaining tracks of a job from its last checkpoint"""
+        job_id = job['job_id']
+        user_id = job['user_id']
+        quality = job['quality']
+
+        if job['attempts'] >= MAX_JOB_ATTEMPTS:
+            logger.warning(f"Giving up on download job {job_id} after {job['attempts']} attempts")
+            self.job_model.finish_job(job_id, 'failed')
+            return
+
+        self.job_model.start_attempt(job_id)
+        tracks = self.job_model.get_job_tracks(job_id)
+        pending_ids = [track['track_id'] for track in tracks if track['state'] == 'pending']
+        logger.info(f"Resuming job {job_id} for user {user_id}: {len(pending_ids)} of {len(tracks)} tracks left")
+
+        if pending_ids:
+            await bot.send_message(
+                chat_id=user_id,
+                text=f"⏳ Resuming your interrupted download ({len(pending_ids)} tracks left)...",
+            )
+            success, _ = await self._process_tracks(
+                user_id, self._single_page(pending_ids), quality, ('job', job_id), job_id=job_id
+            )
+            if not success:
+                return
+
+        # Rebuild the M3U from every delivered track, including the ones sent before the interruption
+        track_ids = [track['track_id'] for track in tracks]
+        cached_tracks = self.download_model.get_tracks_by_ids_quality(track_ids, quality)
+        musics_playlist = []
+        for track_id in track_ids:
+            cached = cached_tracks.get(int(track_id))
+            if cached:
+                musics_playlist.append((cached['title'], cached['duration'], cached['file_name']))
+
+        await self._send_m3u(user_id, job['deezer_id'], musics_playlist)
+        self.job_model.finish_job(job_id)
+
+    async def run_cache_warmer(self):
+        """Warm the cache with trending content during the WARM_HOURS off-peak window"""
+        if not CACHE_CHAT_ID:
+            logger.info("CACHE_CHAT_ID is not set, cache warming disabled")
+            return
+
+        logger.info(f"Cache warmer started (hours: {WARM_HOURS}, qualities: {', '.join(WARM_QUALITIES)})")
+        while True:
+            try:
+                if self._in_warm_window():
+                    await self.warm_cache()
+            except Exception as e:
+                logger.error(f"Error warming cache: {str(e)}", exc_info=True)
+            await asyncio.sleep(WARM_INTERVAL)
+
+    def _in_warm_window(self):
+        """Check whether the current hour is inside WARM_HOURS"""
+        start, end = (int(hour) for hour in WARM_HOURS.split('-'))
+        hour = datetime.now().hour
+        if start <= end:
+            return start <= hour <= end
+        return hour >= start or hour <= end
+
+    async def warm_cache(self):
+        """
+        Download trending tracks, albums and playlists in the qualities that
+        are not cached yet and upload them to CACHE_CHAT_ID
+
+        The uploads are stored like any other download, so later requests for
+        the same content are served from their file_ids.
+
+        Returns:
+            int: Number of items warmed
+        """
+        trending = self.download_model.get_trending_content(WARM_DAYS, WARM_MIN_DOWNLOADS, limit=WARM_BATCH)
+        warmed = 0
+        for item in trending:
+            for quality in WARM_QUALITIES:
+                if quality in item['qualities']:
+                    continue
+                if warmed >= WARM_BATCH or not self._in_warm_window():
+                    logger.info(f"Cache warming round finished: {warmed} items warmed")
+                    return warmed
+                try:
+                    if await self._warm_item(item['deezer_id'], item['content_type'], quality):
+                        warmed += 1
+                except Exception as e:
+                    logger.error(f"Error warming {item['content_type']} {item['deezer_id']} ({quality}): {str(e)}", exc_info=True)
+
+        logger.info(f"Cache warming round finished: {warmed} items warmed")
+        return warmed
+
+    async def _warm_item(self, deezer_id, content_type, quality):
+        """Download one item and upload it to CACHE_CHAT_ID unless a request is already fetching it"""
+        chat_id = int(CACHE_CHAT_ID)
+        key = (deezer_id, content_type, quality)
+        if self.download_flights.in_flight(key):
+            return False
+
+        logger.info(f"Warming cache with {content_type} {deezer_id} ({quality})")
+        if content_type == 'track':
+            _, shared = await self._fetch_track(deezer_id, quality)
+            try:
+                success, musics = await self._deliver_shared_track(chat_id, deezer_id, quality, shared, (chat_id, key))
+            finally:
+                self._release_shared_track(deezer_id, quality)
+            return success and musics is not None
+
+        if self.download_model.get_archive_volumes(deezer_id, content_type, quality):
+            return False
+        url = f"https://www.deezer.com/{content_type}/{deezer_id}"
+        zip_record = await self.download_flights.do(
+            key, self._download_zip, chat_id, url, content_type, deezer_id, quality
+        )
+        return zip_record is not None
+
+    async def _download_zip(self, user_id, url, content_type, deezer_id, quality):
+        """
+        Download an album/playlist as ZIP, send it to the user and store its file_id
+
+        Runs once per (deezer_id, content_type, quality) through download_flights,
+        so concurrent requests for the same content share a single download.
+
+        Returns:
+            dict: file_ids and the user_id they were sent to, or None if nothing was downloaded
+        """
+        # Only assembly failures fall back to the whole download; a failed upload is not retried here
+        archive = None
+        try:
+            archive = await self._assemble_zip(content_type, deezer_id, quality)
+        except Exception as e:
+            logger.error(f"Error assembling ZIP for {content_type} {deezer_id}, downloading it whole: {str(e)}", exc_info=True)
+
+        if archive:
+            return await self._send_zip(
+                user_id, archive['zip_path'], url, content_type, deezer_id, quality,
+                title=archive['title'], artist=archive['artist']
+            )
+
+        logger.info(f"Downloading {content_type} as ZIP: {deezer_id}")
+        smart = await self.deezer_service.download(url, quality_download=quality, make_zip=True)
+
+        if smart.album:
+            logger.info(f"Processing album download: {smart.album.title}")
+            return await self._send_zip(
+                user_id, smart.album.zip_path, url, 'album', deezer_id, quality,
+                title=smart.album.title, artist=smart.album.artist
+            )
+            
+        elif smart.playlist:
+            logger.info(f"Processing playlist download: {smart.playlist.title}")
+            return await self._send_zip(
+                user_id, smart.playlist.zip_path, url, 'playlist', deezer_id, quality,
+                title=smart.playlist.title, artist=smart.playlist.artist
+            )
+
+        return None
+
+    async def _send_zip(self, user_id, zip_path, url, content_type, deezer_id, quality, title, artist=None):
+        """
+        Send an album/playlist ZIP to the user and store its file_id(s)
+
+        Archives larger than ZIP_VOLUME_BYTES are split into volumes which are
+        uploaded concurrently (ZIP_UPLOAD_WORKERS at a time) and stored in
+        archive_volumes in volume order once all of them are sent.
+
+        Returns:
+            dict: file_ids in volume order and the user_id they were sent to
+        """
+        loop = asyncio.get_event_loop()
+        volumes = [zip_path]
+        display_name = sanitize_filename(title)
+        try:
+            success, result = await loop.run_in_executor(None, self.file_handler.split_zip_archive, zip_path, ZIP_VOLUME_BYTES)
+            if not success:
+                raise Exception(result)
+            volumes = result
+
+            if len(volumes) == 1:
+                sent_message = await bot.send_document(
+                    chat_id=user_id, 
+                    document=FSInputFile(volumes[0], filename=f"{display_name}.zip"),
+                    caption=f"@Spotizer_bot 🎧"
+                )
                 
-                for track_id in track_ids:
+                self.download_model.add_track(
+                    user_id=user_id,
+                    deezer_id=deezer_id,
+                    content_type=content_type,
+                    file_id=sent_message.document.file_id,
+                    quality=quality,
+                    url=url,
+                    title=title,
+                    artist=artist,
+                    album=title
+                )
+                return {'file_ids': [sent_message.document.file_id], 'user_id': user_id}
+
+            # With a cache chat the volumes are uploaded there and then sent to the user in order by file_id
+            upload_chat_id = CACHE_CHAT_ID or user_id
+            semaphore = asyncio.Semaphore(ZIP_UPLOAD_WORKERS)
+
+            async def upload_volume(index, volume):
+                async with semaphore:
+                    sent_message = await bot.send_document(
+                        chat_id=upload_chat_id,
+                        document=FSInputFile(volume, filename=f"{display_name}.part{index}.zip"),
+                        caption=f"Part {index}/{len(volumes)}\n\n@Spotizer_bot 🎧"
+                    )
+                    return sent_message.document.file_id
+
+            logger.info(f"Uploading {len(volumes)} ZIP volumes for {content_type} {deezer_id}")
+            results = await asyncio.gather(
+                *(upload_volume(index, volume) for index, volume in enumerate(volumes, 1)),
+                return_exceptions=True
+            )
+            failed = [index for index, result in enumerate(results, 1) if isinstance(result, BaseException)]
+            if failed:
+                # An incomplete set is not stored; tell the user which parts they did not get
+                logger.error(f"Failed to upload ZIP volumes {failed} of {len(volumes)} for {content_type} {deezer_id}")
+                if not CACHE_CHAT_ID and len(failed) < len(volumes):
                     try:
-                        logger.info(f"Processing track: {track_id}")
-                        existing_track = self.download_model.get_track_by_deezer_id_quality(user_id, track_id, quality)
-                        
-                        if existing_track:
-                            logger.info(f"Found existing track: {existing_track['title']}")
-                            await bot.send_audio(
-                                chat_id=user_id,
-                                audio=existing_track['file_id'],
-                                caption=f"@Spotizer_bot 🎧",
-                                title=existing_track['title'],
-                                performer=existing_track['artist']
-                            )
-                            musics = (existing_track['title'], existing_track['duration'], existing_track['file_name'])
-                            musics_playlist.append(musics)
-                        else:
-                            track_link = f"https://www.deezer.com/track/{track_id}"
-                            logger.info(f"Downloading new track: {track_link}")
-                            smart = await self.deezer_service.download(track_link, quality_download=quality, make_zip=False)
-                            
-                            if smart.track:
-                                print("check")
-                                file_path = smart.track.song_path
-                                try:
-                                    print("check2")
-                                    audio_file = FSInputFile(file_path)
-                                    duration = self.file_handler.get_audio_duration(file_path)
-                                    
-                                    title = None
-                                    if hasattr(smart.track, 'music'):
-                                        title = smart.track.music
-                                        logger.info(f"Track title: {title}")
-                                    else:
-                                        logger.warning(f"Title not found for track {track_id}, using default")
-                                        title = f"Track {track_id}"
-                                    
-                                    artist = None
-                                    if hasattr(smart.track, 'artist'):
-                                        artist = smart.track.artist
-                                    else:
-                                        logger.warning(f"Artist not found for track {track_id}, using default")
-                                        artist = "Unknown Artist"
-
-                                    sent_message = await bot.send_audio(
-                                        chat_id=user_id,
-                                        audio=audio_file,
-                                        caption=f"@Spotizer_bot 🎧",
-                                        duration=duration,
-                                        title=title,
-                                        performer=artist
-                                    )
-                                    
-                                    self.download_model.add_track(
-                                        user_id=user_id,
-                                        deezer_id=track_id,
-                                        content_type='track',
-                                        file_id=sent_message.audio.file_id,
-                                        quality=quality,
-                                        url=track_link,
-                                        title=title,
-                                        artist=artist,
-                                        duration=duration,
-                                        file_name=sent_message.audio.file_name,
-                                        album=None
-                                    )
-                                    
-                                    musics = (title, duration, sent_message.audio.file_name)
-                                    musics_playlist.append(musics)
-                                except Exception as e:
-                                    logger.error(f"Download processing error: {str(e)}", exc_info=True)
-                                    return False, "An error occurred while processing your download request."
-                                finally:
-                                    if os.path.exists(file_path):
-                                        os.remove(file_path)
-                                        logger.info(f"Deleted track file: {file_path}")
-                    except Exception as e:
                         await bot.send_message(
                             chat_id=user_id,
-                            text=f"❌ Track 'https://www.deezer.com/us/track/{track_id}' isn't in Deezer or not available for download.",
+                            text=f"⚠️ Parts {', '.join(map(str, failed))} of {len(volumes)} could not be sent. Please request it again for the full archive."
                         )
-                        logger.error(f"Error processing track {track_id}: {str(e)}", exc_info=True)
-                        # return False, "An error occurred while processing your download request."
-
-                if len(musics_playlist) > 1:
-                    filename = f'deezer_{deezer_id}.m3u'
-                    logger.info(f"Creating playlist file: {filename}")
-                    await self.file_handler.playlist_creator(musics_playlist, filename)
-                    
+                    except Exception as e:
+                        logger.warning(f"Could not notify user {user_id} about missing ZIP volumes: {str(e)}")
+                raise results[failed[0] - 1]
+
+            # gather keeps the results in volume order whatever order the uploads finished in
+            file_ids = list(results)
+            if CACHE_CHAT_ID:
+                await self._send_cached_volumes(user_id, file_ids)
+            self.download_model.add_archive_volumes(user_id, deezer_id, content_type, quality, file_ids, title=title)
+            return {'file_ids': file_ids, 'user_id': user_id}
+
+        finally:
+            for path in set(volumes) | {zip_path}:
+                if os.path.exists(path):
+                    os.remove(path)
+                    logger.info(f"Deleted ZIP file: {path}")
+
+    async def _send_cached_volumes(self, user_id, file_ids):
+        """Send an uploaded ZIP, or all volumes of a split ZIP, by file_id"""
+        if len(file_ids) == 1:
+            await bot.send_document(
+                chat_id=user_id,
+                document=file_ids[0],
+                caption=f"@Spotizer_bot 🎧"
+            )
+            return
+
+        for start in range(0, len(file_ids), MEDIA_GROUP_SIZE):
+            batch = file_ids[start:start + MEDIA_GROUP_SIZE]
+            try:
+                await bot.send_media_group(
+                    chat_id=user_id,
+                    media=[
+                        InputMediaDocument(media=file_id, caption=f"Part {start + index}/{len(file_ids)}\n\n@Spotizer_bot 🎧")
+                        for index, file_id in enumerate(batch, 1)
+                    ]
+                )
+            except Exception as e:
+                logger.warning(f"Media group send failed for user {user_id}, sending volumes one by one: {str(e)}")
+                for index, file_id in enumerate(batch, 1):
                     await bot.send_document(
                         chat_id=user_id,
-                        document=FSInputFile(filename),
-                        caption="<a href='https://telegra.ph/How-to-Use-M3U-Playlists-03-02'>What is this and how can I use it?</a>\n\n@Spotizer_bot 🎧",
-                        parse_mode='HTML'
+                        document=file_id,
+                        caption=f"Part {start + index}/{len(file_ids)}\n\n@Spotizer_bot 🎧"
                     )
-                    
-                    if os.path.exists(filename):
-                        os.remove(filename)
-                        logger.info(f"Deleted playlist file: {filename}")
 
-            return True, "Download completed successfully"
+    async def _assemble_zip(self, content_type, deezer_id, quality):
+        """
+        Build an album/playlist ZIP from already cached tracks
+
+        Tracks are read from the local audio cache, then fetched back through
+        the Bot API, and only the remaining ones are downloaded from Deezer.
+
+        Returns:
+            dict: zip_path, title and artist of the archive, or None if no track is cached
+        """
+        track_ids = await self.deezer_service.get_track_list(content_type, deezer_id)
+        cached_tracks = self.download_model.get_tracks_by_ids_quality(track_ids, quality)
+        if not cached_tracks:
+            logger.info(f"No cached tracks for {content_type} {deezer_id}, nothing to assemble from")
+            return None
+
+        logger.info(f"Assembling ZIP for {content_type} {deezer_id} from {len(cached_tracks)} cached of {len(track_ids)} tracks")
+        info = await self.deezer_service.get_deezer_info(content_type, deezer_id)
+        title = info.get('title') or f"{content_type} {deezer_id}"
+        artist = (info.get('artist') or info.get('creator') or {}).get('name')
+
+        work_dir = os.path.join(self.file_handler.temp_dir, f"zip_{content_type}_{deezer_id}_{quality}")
+        os.makedirs(work_dir, exist_ok=True)
+        semaphore = asyncio.Semaphore(DOWNLOAD_WORKERS)
+
+        async def fetch(position, track_id):
+            async with semaphore:
+                prefix = f"{position + 1:02d}"
+                local = await self._get_local_track(track_id, quality, work_dir)
+                if local:
+                    song_path = local.track.song_path
+                    return song_path, sanitize_filename(f"{prefix}. {getattr(local.track, 'music', track_id)}{os.path.splitext(song_path)[1]}")
 
+                cached = cached_tracks.get(int(track_id))
+                if cached:
+                    file_name = cached['file_name'] or f"{cached['title']}.mp3"
+                    destination = os.path.join(work_dir, f"{prefix}_{track_id}{os.path.splitext(file_name)[1]}")
+                    if await self._fetch_cached_file(cached['file_id'], destination):
+                        return destination, sanitize_filename(f"{prefix}. {file_name}")
+
+                track_link = f"https://www.deezer.com/track/{track_id}"
+                logger.info(f"Downloading missing ZIP track: {track_link}")
+                smart = await self.deezer_service.download(track_link, output_folder=work_dir, quality_download=quality, make_zip=False)
+                if smart and smart.track:
+                    await self._cache_track_file(track_id, quality, smart.track)
+                    song_path = smart.track.song_path
+                    return song_path, sanitize_filename(f"{prefix}. {os.path.basename(song_path)}")
+
+                logger.warning(f"Track {track_id} left out of ZIP for {content_type} {deezer_id}")
+                return None
+
+        try:
+            results = await asyncio.gather(*(fetch(position, track_id) for position, track_id in enumerate(track_ids)))
+            files = [result for result in results if result]
+            if not files:
+                return None
+
+            loop = asyncio.get_event_loop()
+            # Named after the flight key so concurrent assemblies never share a path; the
+            # title is only used as the upload name
+            archive_name = f"zip_{content_type}_{deezer_id}_{quality}.zip"
+            success, zip_path = await loop.run_in_executor(None, self.file_handler.build_zip_archive, files, archive_name)
+            if not success:
+                raise Exception(zip_path)
+
+            return {'zip_path': zip_path, 'title': title, 'artist': artist}
+
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    async def _fetch_cached_file(self, file_id, destination):
+        """
+        Fetch an uploaded file back from Telegram
+
+        With a local Bot API server get_file returns a path on this machine
+        and the file is copied directly instead of downloaded.
+
+        Returns:
+            bool: True if the file was written to destination
+        """
+        try:
+            telegram_file = await bot.get_file(file_id)
+            if os.path.isabs(telegram_file.file_path) and os.path.exists(telegram_file.file_path):
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(None, shutil.copyfile, telegram_file.file_path, destination)
+            else:
+                await bot.download_file(telegram_file.file_path, destination=destination)
+            return True
+        except Exception as e:
+            logger.warning(f"Could not fetch cached file {file_id} from Telegram: {str(e)}")
+            return False
+
+    async def _process_tracks(self, user_id, track_pages, quality, request_key, job_id=None, add_to_job=False):
+        """
+        Download and upload the tracks of an album/playlist as a two-stage pipeline
+
+        A producer reads the track list page by page and prefetches tracks
+        from Deezer (at most DOWNLOAD_WORKERS at a time) into a queue holding
+        up to PREFETCH_TRACKS entries, while the consumer uploads finished
+        tracks in album/playlist order. Delivery starts with the first page,
+        and the bounded queue keeps the number of downloaded-but-unsent
+        files on disk capped.
+
+        Args:
+            user_id (int): Telegram chat to deliver the tracks to
+            track_pages (AsyncIterable[list]): Pages of Deezer track IDs in album/playlist order
+            quality (str): Download quality
+            request_key (tuple): What was asked for; only a repeated identical request
+                (e.g. a double-click) shares the delivery of a track with this one
+            job_id (int): Download job to checkpoint each track's state into (optional)
+            add_to_job (bool): Record each page's tracks in the job as they are read
+
+        Returns:
+            tuple[bool, list]: Success status and (title, duration, file_name) entries for the M3U playlist
+        """
+        semaphore = asyncio.Semaphore(DOWNLOAD_WORKERS)
+        prefetched = asyncio.Queue(maxsize=PREFETCH_TRACKS)
+        cached_tracks = {}
+
+        async def fetch(track_id):
+            existing_track = cached_tracks.get(int(track_id))
+            if existing_track:
+                return existing_track, None
+            async with semaphore:
+                return await self._fetch_track(track_id, quality)
+
+        async def produce():
+            position = 0
+            try:
+                async for page in track_pages:
+                    page_cached = self.download_model.get_tracks_by_ids_quality(page, quality)
+                    logger.info(f"{len(page_cached)} of {len(page)} tracks already cached")
+                    self.download_model.update_download_counts(list(page_cached))
+                    cached_tracks.update(page_cached)
+                    if job_id and add_to_job:
+                        self.job_model.add_job_tracks(job_id, page, position)
+                    position += len(page)
+
+                    for track_id in page:
+                        task = asyncio.create_task(fetch(track_id))
+                        try:
+                            await prefetched.put((track_id, task))
+                        except asyncio.CancelledError:
+                            self._discard_fetch(track_id, quality, task)
+                            raise
+            except Exception as e:
+                # Hand the failure to the consumer instead of leaving it waiting
+                await prefetched.put(e)
+                return
+            await prefetched.put(None)
+
+        logger.info(f"Processing tracks with {DOWNLOAD_WORKERS} workers, prefetching {PREFETCH_TRACKS}")
+        producer = asyncio.create_task(produce())
+        async def send_group(group):
+            results = await self._send_cached_group(user_id, group)
+            for track, musics in zip(group, results):
+                self._checkpoint(job_id, track['track_id'], musics)
+            return [musics for musics in results if musics]
+
+        musics_playlist = []
+        media_group = []
+        position = 0
+        try:
+            while True:
+                item = await prefetched.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+
+                track_id, task = item
+                # A track listed twice in the same request is delivered twice
+                request_token = (user_id, request_key, position)
+                position += 1
+                existing_track = cached_tracks.get(int(track_id))
+                if existing_track and MEDIA_GROUP_DELIVERY:
+                    # Cached tracks are collected and sent as albums of up to 10 audios
+                    await task
+                    media_group.append(existing_track)
+                    if len(media_group) == MEDIA_GROUP_SIZE:
+                        musics_playlist.extend(await send_group(media_group))
+                        media_group = []
+                    continue
+
+                if media_group:
+                    musics_playlist.extend(await send_group(media_group))
+                    media_group = []
+
+                success, musics = await self._deliver_track(user_id, track_id, quality, task, request_token)
+                if not success:
+                    return False, musics_playlist
+                self._checkpoint(job_id, track_id, musics)
+                if musics:
+                    musics_playlist.append(musics)
+
+            if media_group:
+                musics_playlist.extend(await send_group(media_group))
+
+            return True, musics_playlist
+
+        finally:
+            producer.cancel()
+            # Let go of downloads that were prefetched but never delivered
+            while not prefetched.empty():
+                item = prefetched.get_nowait()
+                if isinstance(item, tuple):
+                    self._discard_fetch(item[0], quality, item[1])
+
+    @staticmethod
+    async def _single_page(track_ids):
+        """Wrap a known track list as the page iterator _process_tracks expects"""
+        yield track_ids
+
+    def _checkpoint(self, job_id, track_id, musics):
+        """Record whether a track of a download job was delivered"""
+        if job_id:
+            self.job_model.update_track_state(job_id, track_id, 'delivered' if musics else 'failed')
+
+    async def _deliver_track(self, user_id, track_id, quality, task, request_token):
+        """
+        Wait for a prefetched track and send it to the user
+
+        Args:
+            request_token (tuple): Identifies this delivery, see _deliver_shared_track
+
+        Returns:
+            tuple[bool, tuple]: Success status (False aborts the whole request) and
+            (title, duration, file_name) for the M3U playlist, or None if nothing was sent
+        """
+        try:
+            logger.info(f"Processing track: {track_id}")
+            try:
+                existing_track, shared = await task
+            except asyncio.CancelledError:
+                self._discard_fetch(track_id, quality, task)
+                raise
+
+            if existing_track:
+                logger.info(f"Found existing track: {existing_track['title']}")
+                return True, await self._send_cached_track(user_id, existing_track)
+
+            try:
+                return await self._deliver_shared_track(user_id, track_id, quality, shared, request_token)
+            finally:
+                self._release_shared_track(track_id, quality)
+        except Exception as e:
+            await bot.send_message(
+                chat_id=user_id,
+                text=f"❌ Track 'https://www.deezer.com/us/track/{track_id}' isn't in Deezer or not available for download.",
+            )
+            logger.error(f"Error processing track {track_id}: {str(e)}", exc_info=True)
+            return True, None
+
+    def _discard_fetch(self, track_id, quality, task):
+        """Cancel a prefetch task, or release its download if it already finished"""
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled() and task.exception() is None:
+            _, shared = task.result()
+            if shared:
+                self._release_shared_track(track_id, quality)
+
+    async def _fetch_track(self, track_id, quality):
+        """
+        Join the shared download for a track that is not cached yet
+
+        Returns:
+            tuple: (None, shared) where shared must be handed back with _release_shared_track
+        """
+        key = (track_id, 'track', quality)
+        shared = await self.download_flights.acquire(key, self._download_shared_track, track_id, quality)
+        return None, shared
+
+    async def _download_shared_track(self, track_id, quality):
+        """Download a track once for every request waiting on it, reading the local audio cache first"""
+        smart = await self._get_local_track(track_id, quality)
+        if not smart:
+            track_link = f"https://www.deezer.com/track/{track_id}"
+            logger.info(f"Downloading new track: {track_link}")
+            smart = await self.deezer_service.download(track_link, quality_download=quality, make_zip=False)
+            if smart and smart.track:
+                await self._cache_track_file(track_id, quality, smart.track)
+        return {'smart': smart, 'record': None, 'delivered': set(), 'lock': asyncio.Lock()}
+
+    async def _get_local_track(self, track_id, quality, destination_dir=None):
+        """
+        Get a track from the local audio cache, transcoding it from a better
+        cached quality (see TRANSCODE_SOURCES) when the requested one is missing
+
+        Returns:
+            SimpleNamespace: Object shaped like deezloader's Smart (track.song_path,
+            track.music, track.artist, track.file_name), or None on a cache miss
+        """
+        cached_path, meta = await self.file_handler.get_cached_audio(track_id, quality, destination_dir)
+        if not cached_path:
+            cached_path, meta = await self._transcode_local_track(track_id, quality, destination_dir)
+        if not cached_path:
+            return None
+        track = SimpleNamespace(song_path=cached_path)
+        if meta.get('title'):
+            track.music = meta['title']
+        if meta.get('artist'):
+            track.artist = meta['artist']
+        # The checked-out copy has a cache name; the user gets the original one
+        if meta.get('file_name'):
+            track.file_name = meta['file_name']
+        return SimpleNamespace(track=track)
+
+    async def _transcode_local_track(self, track_id, quality, destination_dir=None):
+        """
+        Derive a quality from the best cached source and cache the result as that quality
+
+        Returns:
+            tuple: (file_path, meta) of the transcoded file, or (None, {}) if no source is cached
+        """
+        for source_quality in TRANSCODE_SOURCES.get(quality, []):
+            source_path, meta = await self.file_handler.get_cached_audio(track_id, source_quality, destination_dir)
+            if not source_path:
+                continue
+
+            # The source name is unique per checkout, so the output name is as well
+            output_path = f"{os.path.splitext(source_path)[0]}_{quality}.mp3"
+            try:
+                logger.info(f"Deriving {quality} of track {track_id} from cached {source_quality}")
+                success, output_path = await self.file_handler.transcode_to_quality(source_path, quality, output_path)
+            finally:
+                if os.path.exists(source_path):
+                    os.remove(source_path)
+            if not success:
+                continue
+
+            file_name = meta.get('file_name')
+            if file_name:
+                meta = dict(meta, file_name=f"{os.path.splitext(file_name)[0]}.mp3")
+            await self.file_handler.cache_audio(track_id, quality, output_path, **meta)
+            return output_path, meta
+        return None, {}
+
+    async def _cache_track_file(self, track_id, quality, track):
+        """Keep a copy of a freshly downloaded track in the local audio cache"""
+        await self.file_handler.cache_audio(
+            track_id, quality, track.song_path,
+            title=getattr(track, 'music', None),
+            artist=getattr(track, 'artist', None),
+            file_name=getattr(track, 'file_name', None) or os.path.basename(track.song_path)
+        )
+
+    def _release_shared_track(self, track_id, quality):
+        """Release a shared download, deleting its file once nobody needs it"""
+        self.download_flights.release((track_id, 'track', quality), cleanup=self._remove_shared_track)
+
+    def _remove_shared_track(self, shared):
+        """Delete the downloaded file of a shared track"""
+        track = getattr(shared['smart'], 'track', None) if shared['smart'] else None
+        file_path = getattr(track, 'song_path', None)
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+            logger.info(f"Deleted track file: {file_path}")
+
+    async def _deliver_shared_track(self, user_id, track_id, quality, shared, request_token):
+        """
+        Deliver a shared download, uploading it only if no other request has yet
+
+        Args:
+            request_token (tuple): (chat, request, position) of this delivery; a delivery
+                with the same token as an earlier one is a repeated identical request
+                (e.g. a double-click) and is not sent again
+
+        Returns:
+            tuple[bool, tuple]: Success status and (title, duration, file_name) for the M3U playlist
+        """
+        async with shared['lock']:
+            record = shared['record']
+            if record:
+                if request_token in shared['delivered']:
+                    logger.info(f"Track {track_id} was already sent for an identical request")
+                    return True, (record['title'], record['duration'], record['file_name'])
+                logger.info(f"Reusing file_id uploaded for another request: {track_id}")
+                musics = await self._send_cached_track(user_id, record)
+                shared['delivered'].add(request_token)
+                return True, musics
+
+            if not shared['smart'].track:
+                return True, None
+
+            success, record = await self._upload_track(user_id, track_id, quality, shared['smart'].track)
+            if not success:
+                return False, None
+            shared['record'] = record
+            shared['delivered'].add(request_token)
+            return True, (record['title'], record['duration'], record['file_name'])
+
+    async def _send_cached_track(self, user_id, track):
+        """
+        Send an already uploaded track by its file_id
+
+        Returns:
+            tuple: (title, duration, file_name) for the M3U playlist
+        """
+        await bot.send_audio(
+            chat_id=user_id,
+            audio=track['file_id'],
+            caption=f"@Spotizer_bot 🎧",
+            title=track['title'],
+            performer=track['artist']
+        )
+        return (track['title'], track['duration'], track['file_name'])
+
+    async def _send_cached_group(self, user_id, tracks):
+        """
+        Send cached tracks as one media group, one by one if Telegram rejects it
+
+        Returns:
+            list: (title, duration, file_name) entry per track, None for tracks that could not be sent
+        """
+        if len(tracks) > 1:
+            try:
+                media = [
+                    InputMediaAudio(
+                        media=track['file_id'],
+                        caption=f"@Spotizer_bot 🎧",
+                        title=track['title'],
+                        performer=track['artist']
+                    )
+                    for track in tracks
+                ]
+                await bot.send_media_group(chat_id=user_id, media=media)
+                logger.info(f"Sent {len(tracks)} cached tracks as a media group to user {user_id}")
+                return [(track['title'], track['duration'], track['file_name']) for track in tracks]
+            except Exception as e:
+                logger.warning(f"Media group send failed for user {user_id}, sending tracks one by one: {str(e)}")
+
+        musics = []
+        for track in tracks:
+            try:
+                musics.append(await self._send_cached_track(user_id, track))
+            except Exception as e:
+                musics.append(None)
+                await bot.send_message(
+                    chat_id=user_id,
+                    text=f"❌ Track 'https://www.deezer.com/us/track/{track['track_id']}' isn't in Deezer or not available for download.",
+                )
+                logger.error(f"Error sending cached track {track['track_id']}: {str(e)}", exc_info=True)
+        return musics
+
+    async def _upload_track(self, user_id, track_id, quality, track):
+        """
+        Upload a downloaded track to the user and store its file_id
+
+        Returns:
+            tuple[bool, dict]: Success status and the stored track record
+        """
+        track_link = f"https://www.deezer.com/track/{track_id}"
+        file_path = track.song_path
+        try:
+            audio_file = FSInputFile(file_path, filename=getattr(track, 'file_name', None))
+            duration = self.file_handler.get_audio_duration(file_path)
+
+            title = None
+            if hasattr(track, 'music'):
+                title = track.music
+                logger.info(f"Track title: {title}")
+            else:
+                logger.warning(f"Title not found for track {track_id}, using default")
+                title = f"Track {track_id}"
+
+            artist = None
+            if hasattr(track, 'artist'):
+                artist = track.artist
+            else:
+                logger.warning(f"Artist not found for track {track_id}, using default")
+                artist = "Unknown Artist"
+
+            sent_message = await bot.send_audio(
+                chat_id=user_id,
+                audio=audio_file,
+                caption=f"@Spotizer_bot 🎧",
+                duration=duration,
+                title=title,
+                performer=artist
+            )
+
+            self.download_model.add_track(
+                user_id=user_id,
+                deezer_id=track_id,
+                content_type='track',
+                file_id=sent_message.audio.file_id,
+                quality=quality,
+                url=track_link,
+                title=title,
+                artist=artist,
+                duration=duration,
+                file_name=sent_message.audio.file_name,
+                album=None
+            )
+
+            return True, {
+                'file_id': sent_message.audio.file_id,
+                'title': title,
+                'artist': artist,
+                'duration': duration,
+                'file_name': sent_message.audio.file_name,
+                'user_id': user_id
+            }
         except Exception as e:
             logger.error(f"Download processing error: {str(e)}", exc_info=True)
-            return False, "An error occurred while processing your download request."
+            return False, None
 
     async def get_user_downloads(self, user_id, limit=5):
         """Get user's download history"""
@@ -298,7 +1084,7 @@ class DownloadController:
         """Get artist's top tracks"""
         try:
             logger.info(f"Getting top tracks for artist {artist_id}")
-            top_tracks = self.spotify_service.sp.artist_top_tracks(artist_id)['tracks']
+            top_tracks = (await self.spotify_service.artist_top_tracks(artist_id))['tracks']
             processed_tracks = []
             for track in top_tracks:
                 processed_tracks.append({
@@ -315,7 +1101,7 @@ class DownloadController:
         """Get artist's albums"""
         try:
             logger.info(f"Getting albums for artist {artist_id}")
-            albums = self.spotify_service.sp.artist_albums(artist_id, album_type='album')['items']
+            albums = (await self.spotify_service.artist_albums(artist_id))['items']
             processed_albums = []
             for album in albums:
                 processed_albums.append({
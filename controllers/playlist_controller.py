@@ -132,7 +132,7 @@ class PlayListController:
             else:
                 track_id = callback_query.data.split(":")[3]
                 spotify_url = f"https://open.spotify.com/track/{track_id}"
-                url = self.deezer_service.convert_to_deezer(spotify_url)
+                url = await self.deezer_service.convert_to_deezer(spotify_url)
                 content_type, deezer_id = self.deezer_service.extract_info_from_url(url)
                 playlist_id = callback_query.data.split(":")[2]
                 success, message = await self.add_to_playlist(user_id, playlist_id, deezer_id)
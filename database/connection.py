@@ -200,6 +200,75 @@ def init_db():
             )
             """)
             logger.info("Playlist tracks table created/verified")        
+
+            # Download jobs table (resumable album/playlist downloads)
+            logger.info("Creating download_jobs table")
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS download_jobs (
+                job_id SERIAL PRIMARY KEY,
+                user_id BIGINT REFERENCES users(user_id) ON DELETE CASCADE,
+                deezer_id BIGINT NOT NULL,
+                content_type VARCHAR(20) NOT NULL,
+                quality VARCHAR(50) NOT NULL,
+                status VARCHAR(20) DEFAULT 'running',
+                attempts INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            logger.info("Download jobs table created/verified")
+
+            logger.info("Creating download_job_tracks table")
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS download_job_tracks (
+                job_id INTEGER REFERENCES download_jobs(job_id) ON DELETE CASCADE,
+                position INTEGER NOT NULL,
+                track_id BIGINT NOT NULL,
+                state VARCHAR(20) DEFAULT 'pending',
+                PRIMARY KEY (job_id, position)
+            )
+            """)
+            logger.info("Download job tracks table created/verified")
+
+            # Archive volumes table (ZIPs split to fit the upload limit)
+            logger.info("Creating archive_volumes table")
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS archive_volumes (
+                deezer_id BIGINT NOT NULL,
+                content_type VARCHAR(20) NOT NULL,
+                quality VARCHAR(50) NOT NULL,
+                volume INTEGER NOT NULL,
+                file_id TEXT NOT NULL,
+                title VARCHAR(255),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (deezer_id, content_type, quality, volume)
+            )
+            """)
+            logger.info("Archive volumes table created/verified")
+
+            # Deezer API responses (album/playlist metadata and track list pages)
+            logger.info("Creating deezer_metadata table")
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS deezer_metadata (
+                path TEXT PRIMARY KEY,
+                data JSONB NOT NULL,
+                fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            logger.info("Deezer metadata table created/verified")
+
+            # Spotify to Deezer matches (deezer_id NULL means no match was found)
+            logger.info("Creating spotify_deezer_map table")
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS spotify_deezer_map (
+                spotify_type VARCHAR(20) NOT NULL,
+                spotify_id VARCHAR(64) NOT NULL,
+                deezer_id BIGINT,
+                matched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (spotify_type, spotify_id)
+            )
+            """)
+            logger.info("Spotify to Deezer map table created/verified")
             
             conn.commit()
             logger.info("All database tables created successfully")
@@ -237,6 +306,20 @@ def create_indexes():
             ON tracks(download_count DESC)
             """)
 
+            # Index for picking recently trending content to warm the cache with
+            logger.info("Creating index on tracks(last_downloaded)")
+            cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tracks_last_downloaded 
+            ON tracks(last_downloaded)
+            """)
+
+            # Index for resuming unfinished download jobs
+            logger.info("Creating index on download_jobs(status)")
+            cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_download_jobs_status 
+            ON download_jobs(status)
+            """)
+
             conn.commit()
             logger.info("All database indexes created successfully")
             
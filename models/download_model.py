@@ -144,17 +144,24 @@ class DownloadModel:
             logger.error(f"Failed to retrieve user downloads: {str(e)}", exc_info=True)
             return []
 
-    def update_download_count(self, deezer_id: int) -> bool:
-        """Update download count for a track"""
+    def update_download_count(self, deezer_id: int, content_type: str = None) -> bool:
+        """Update download count for a track (or an album/playlist ZIP when content_type is given)"""
         try:
             with get_connection() as conn:
                 with conn.cursor() as cur:
-                    cur.execute("""
+                    query = """
                     UPDATE tracks 
                     SET download_count = download_count + 1,
                         last_downloaded = CURRENT_TIMESTAMP
                     WHERE track_id = %s
-                    """, (deezer_id,))
+                    """
+                    params = [deezer_id]
+
+                    if content_type:
+                        query += " AND content_type = %s"
+                        params.append(content_type)
+
+                    cur.execute(query, params)
                     conn.commit()
                     logger.info(f"Updated download count for track {deezer_id}")
                     return True
@@ -162,6 +169,27 @@ class DownloadModel:
             logger.error(f"Failed to update download count: {str(e)}", exc_info=True)
             return False
 
+    def update_download_counts(self, deezer_ids: List[int], content_type: str = 'track') -> bool:
+        """Update download count for many tracks in a single query"""
+        try:
+            deezer_ids = [int(deezer_id) for deezer_id in deezer_ids]
+            if not deezer_ids:
+                return True
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                    UPDATE tracks
+                    SET download_count = download_count + 1,
+                        last_downloaded = CURRENT_TIMESTAMP
+                    WHERE track_id = ANY(%s) AND content_type = %s
+                    """, (deezer_ids, content_type))
+                    conn.commit()
+                    logger.info(f"Updated download count for {len(deezer_ids)} tracks")
+                    return True
+        except Exception as e:
+            logger.error(f"Failed to update download counts: {str(e)}", exc_info=True)
+            return False
+
     def get_popular_downloads(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get most popular downloads"""
         try:
@@ -189,6 +217,40 @@ class DownloadModel:
             logger.error(f"Failed to retrieve popular downloads: {str(e)}", exc_info=True)
             return []
 
+    def get_trending_content(self, days: int = 7, min_downloads: int = 2, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Get the most downloaded tracks, albums and playlists of the last days
+
+        Every cached quality row of an item is counted together, so the result
+        also tells which qualities are already cached.
+        """
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                    SELECT track_id, content_type, MAX(download_count) AS score, ARRAY_AGG(DISTINCT quality)
+                    FROM tracks
+                    WHERE last_downloaded >= CURRENT_TIMESTAMP - make_interval(days => %s)
+                    GROUP BY track_id, content_type
+                    HAVING MAX(download_count) >= %s
+                    ORDER BY score DESC
+                    LIMIT %s
+                    """, (days, min_downloads, limit))
+
+                    trending = []
+                    for row in cur.fetchall():
+                        trending.append({
+                            'deezer_id': row[0],
+                            'content_type': row[1],
+                            'download_count': row[2],
+                            'qualities': [quality for quality in row[3] if quality]
+                        })
+                    logger.info(f"Retrieved {len(trending)} trending items of the last {days} days")
+                    return trending
+        except Exception as e:
+            logger.error(f"Failed to retrieve trending content: {str(e)}", exc_info=True)
+            return []
+
     def get_track_by_deezer_id_quality(self, user_id, deezer_id, quality):
         """Get track by deezer id and quality"""
         try:
@@ -222,6 +284,42 @@ class DownloadModel:
             logger.error(f"Failed to retrieve track: {str(e)}", exc_info=True)
             return None
     
+    def get_tracks_by_ids_quality(self, deezer_ids: List[int], quality: str) -> Dict[int, Dict[str, Any]]:
+        """Get cached tracks for many deezer ids at one quality in a single query"""
+        try:
+            deezer_ids = [int(deezer_id) for deezer_id in deezer_ids]
+            if not deezer_ids:
+                return {}
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    query = """
+                            SELECT track_id, file_id, title, artist, album, download_count, quality, duration, file_name
+                            FROM tracks
+                            WHERE track_id = ANY(%s) AND quality = %s
+                        """
+                    cur.execute(query, (deezer_ids, quality))
+                    tracks = {}
+                    for row in cur.fetchall():
+                        track_id = int(row[0])
+                        if track_id in tracks:
+                            continue
+                        tracks[track_id] = {
+                            'track_id': row[0],
+                            'file_id': row[1],
+                            'title': row[2],
+                            'artist': row[3],
+                            'album': row[4],
+                            'download_count': row[5],
+                            'quality': row[6],
+                            'duration': row[7],
+                            'file_name': row[8]
+                        }
+                    logger.info(f"Retrieved {len(tracks)} of {len(deezer_ids)} track records with quality {quality}")
+                    return tracks
+        except Exception as e:
+            logger.error(f"Failed to retrieve tracks: {str(e)}", exc_info=True)
+            return {}
+
     def add_track(self, user_id, deezer_id, content_type, file_id, quality, title, artist=None, album=None, duration=None, file_name=None, url=None):
         """Add a new track to the database"""
         try:
@@ -240,3 +338,44 @@ class DownloadModel:
         except Exception as e:
             logger.error(f"Failed to add track record: {str(e)}", exc_info=True)
             return False
+
+    def add_archive_volumes(self, user_id, deezer_id, content_type, quality, file_ids, title=None):
+        """Store the file_ids of a multi-volume ZIP in volume order"""
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                    DELETE FROM archive_volumes
+                    WHERE deezer_id = %s AND content_type = %s AND quality = %s
+                    """, (deezer_id, content_type, quality))
+                    cur.executemany("""
+                    INSERT INTO archive_volumes (deezer_id, content_type, quality, volume, file_id, title)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    """, [
+                        (deezer_id, content_type, quality, volume, file_id, title)
+                        for volume, file_id in enumerate(file_ids, 1)
+                    ])
+                    conn.commit()
+                    logger.info(f"Added {len(file_ids)} archive volumes for {content_type} {deezer_id} (User: {user_id})")
+                    return True
+        except Exception as e:
+            logger.error(f"Failed to add archive volumes: {str(e)}", exc_info=True)
+            return False
+
+    def get_archive_volumes(self, deezer_id, content_type, quality) -> List[str]:
+        """Get the file_ids of a multi-volume ZIP in volume order"""
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                    SELECT file_id
+                    FROM archive_volumes
+                    WHERE deezer_id = %s AND content_type = %s AND quality = %s
+                    ORDER BY volume
+                    """, (deezer_id, content_type, quality))
+                    file_ids = [row[0] for row in cur.fetchall()]
+                    logger.info(f"Retrieved {len(file_ids)} archive volumes for {content_type} {deezer_id} with quality {quality}")
+                    return file_ids
+        except Exception as e:
+            logger.error(f"Failed to retrieve archive volumes: {str(e)}", exc_info=True)
+            return []
@@ -0,0 +1,186 @@
+from typing import Dict, List, Optional, Any
+from database.connection import get_connection
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+class JobModel:
+    """Persisted album/playlist download jobs and their per-track progress"""
+
+    def create_job(self, user_id: int, deezer_id: int, content_type: str, quality: str, track_ids: List[int]) -> Optional[int]:
+        """Create a job with all of its tracks in 'pending' state and return its ID"""
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                    INSERT INTO download_jobs (user_id, deezer_id, content_type, quality)
+                    VALUES (%s, %s, %s, %s)
+                    RETURNING job_id
+                    """, (user_id, deezer_id, content_type, quality))
+                    job_id = cur.fetchone()[0]
+
+                    cur.executemany("""
+                    INSERT INTO download_job_tracks (job_id, position, track_id)
+                    VALUES (%s, %s, %s)
+                    """, [(job_id, position, track_id) for position, track_id in enumerate(track_ids)])
+
+                    conn.commit()
+                    logger.info(f"Created download job {job_id} for {content_type} {deezer_id} with {len(track_ids)} tracks (User: {user_id})")
+                    return job_id
+        except Exception as e:
+            logger.error(f"Failed to create download job: {str(e)}", exc_info=True)
+            return None
+
+    def add_job_tracks(self, job_id: int, track_ids: List[int], start_position: int) -> bool:
+        """Append tracks in 'pending' state to a job, numbered from start_position"""
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.executemany("""
+                    INSERT INTO download_job_tracks (job_id, position, track_id)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (job_id, position) DO NOTHING
+                    """, [(job_id, start_position + offset, track_id) for offset, track_id in enumerate(track_ids)])
+                    conn.commit()
+                    logger.info(f"Added {len(track_ids)} tracks to download job {job_id}")
+                    return True
+        except Exception as e:
+            logger.error(f"Failed to add tracks to download job {job_id}: {str(e)}", exc_info=True)
+            return False
+
+    def update_track_state(self, job_id: int, track_id: int, state: str) -> bool:
+        """Checkpoint the state ('pending', 'delivered', 'failed') of a track in a job"""
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                    UPDATE download_job_tracks
+                    SET state = %s
+                    WHERE job_id = %s AND track_id = %s
+                    """, (state, job_id, track_id))
+                    cur.execute("""
+                    UPDATE download_jobs SET updated_at = CURRENT_TIMESTAMP WHERE job_id = %s
+                    """, (job_id,))
+                    conn.commit()
+                    return True
+        except Exception as e:
+            logger.error(f"Failed to update track {track_id} of job {job_id}: {str(e)}", exc_info=True)
+            return False
+
+    def finish_job(self, job_id: int, status: str = 'completed') -> bool:
+        """Mark a job as finished so it is not resumed again"""
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                    UPDATE download_jobs
+                    SET status = %s, updated_at = CURRENT_TIMESTAMP
+                    WHERE job_id = %s
+                    """, (status, job_id))
+                    conn.commit()
+                    logger.info(f"Download job {job_id} finished with status {status}")
+                    return True
+        except Exception as e:
+            logger.error(f"Failed to finish download job {job_id}: {str(e)}", exc_info=True)
+            return False
+
+    def start_attempt(self, job_id: int) -> bool:
+        """Count a resume attempt for a job"""
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                    UPDATE download_jobs
+                    SET attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+                    WHERE job_id = %s
+                    """, (job_id,))
+                    conn.commit()
+                    return True
+        except Exception as e:
+            logger.error(f"Failed to update attempts of job {job_id}: {str(e)}", exc_info=True)
+            return False
+
+    def finish_user_jobs(self, user_id: int, deezer_id: int, content_type: str, status: str = 'completed') -> int:
+        """Finish a user's running jobs for some content, e.g. when they request it again"""
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                    UPDATE download_jobs
+                    SET status = %s, updated_at = CURRENT_TIMESTAMP
+                    WHERE user_id = %s AND deezer_id = %s AND content_type = %s AND status = 'running'
+                    """, (status, user_id, deezer_id, content_type))
+                    count = cur.rowcount
+                    conn.commit()
+                    if count:
+                        logger.info(f"Finished {count} earlier download jobs for {content_type} {deezer_id} (User: {user_id})")
+                    return count
+        except Exception as e:
+            logger.error(f"Failed to finish earlier download jobs for {content_type} {deezer_id}: {str(e)}", exc_info=True)
+            return 0
+
+    def expire_jobs(self, max_age_hours: int) -> int:
+        """Mark running jobs created more than max_age_hours ago as failed so they are not resumed"""
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                    UPDATE download_jobs
+                    SET status = 'failed', updated_at = CURRENT_TIMESTAMP
+                    WHERE status = 'running'
+                    AND created_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 hour'
+                    """, (max_age_hours,))
+                    count = cur.rowcount
+                    conn.commit()
+                    logger.info(f"Expired {count} download jobs older than {max_age_hours} hours")
+                    return count
+        except Exception as e:
+            logger.error(f"Failed to expire old download jobs: {str(e)}", exc_info=True)
+            return 0
+
+    def get_unfinished_jobs(self) -> List[Dict[str, Any]]:
+        """Get all jobs that are still running, oldest first"""
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                    SELECT job_id, user_id, deezer_id, content_type, quality, attempts, created_at
+                    FROM download_jobs
+                    WHERE status = 'running'
+                    ORDER BY created_at
+                    """)
+                    jobs = []
+                    for row in cur.fetchall():
+                        jobs.append({
+                            'job_id': row[0],
+                            'user_id': row[1],
+                            'deezer_id': row[2],
+                            'content_type': row[3],
+                            'quality': row[4],
+                            'attempts': row[5],
+                            'created_at': row[6]
+                        })
+                    logger.info(f"Retrieved {len(jobs)} unfinished download jobs")
+                    return jobs
+        except Exception as e:
+            logger.error(f"Failed to retrieve unfinished download jobs: {str(e)}", exc_info=True)
+            return []
+
+    def get_job_tracks(self, job_id: int) -> List[Dict[str, Any]]:
+        """Get the tracks of a job in album/playlist order"""
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                    SELECT position, track_id, state
+                    FROM download_job_tracks
+                    WHERE job_id = %s
+                    ORDER BY position
+                    """, (job_id,))
+                    return [
+                        {'position': row[0], 'track_id': row[1], 'state': row[2]}
+                        for row in cur.fetchall()
+                    ]
+        except Exception as e:
+            logger.error(f"Failed to retrieve tracks of job {job_id}: {str(e)}", exc_info=True)
+            return []
@@ -0,0 +1,45 @@
+from typing import Dict, Optional, Any
+from psycopg2.extras import Json
+from database.connection import get_connection
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+class MetadataModel:
+    """Persistent copies of Deezer API responses"""
+
+    def get_metadata(self, path: str, max_age: int) -> Optional[Dict[str, Any]]:
+        """Get the stored response for an API path if it is at most max_age seconds old"""
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                    SELECT data
+                    FROM deezer_metadata
+                    WHERE path = %s AND fetched_at >= CURRENT_TIMESTAMP - make_interval(secs => %s)
+                    """, (path, max_age))
+                    row = cur.fetchone()
+                    if row:
+                        logger.info(f"Retrieved stored Deezer metadata for {path}")
+                        return row[0]
+                    return None
+        except Exception as e:
+            logger.error(f"Failed to retrieve Deezer metadata for {path}: {str(e)}", exc_info=True)
+            return None
+
+    def save_metadata(self, path: str, data: Dict[str, Any]) -> bool:
+        """Store or refresh the response for an API path"""
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                    INSERT INTO deezer_metadata (path, data)
+                    VALUES (%s, %s)
+                    ON CONFLICT (path) DO UPDATE
+                    SET data = EXCLUDED.data, fetched_at = CURRENT_TIMESTAMP
+                    """, (path, Json(data)))
+                    conn.commit()
+                    return True
+        except Exception as e:
+            logger.error(f"Failed to store Deezer metadata for {path}: {str(e)}", exc_info=True)
+            return False
@@ -0,0 +1,54 @@
+from typing import Dict, Optional, Any
+from database.connection import get_connection
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+class SpotifyMapModel:
+    """Spotify to Deezer ID matches, including items known to have no match"""
+
+    def get_mapping(self, spotify_type: str, spotify_id: str, negative_ttl: int) -> Optional[Dict[str, Any]]:
+        """
+        Get the Deezer match of a Spotify item
+
+        No-match entries older than negative_ttl seconds are ignored so the
+        item is looked up again.
+
+        Returns:
+            dict: {'deezer_id': int or None (no match)}, or None if the item was never looked up
+        """
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                    SELECT deezer_id
+                    FROM spotify_deezer_map
+                    WHERE spotify_type = %s AND spotify_id = %s
+                      AND (deezer_id IS NOT NULL OR matched_at >= CURRENT_TIMESTAMP - make_interval(secs => %s))
+                    """, (spotify_type, spotify_id, negative_ttl))
+                    row = cur.fetchone()
+                    if row:
+                        logger.info(f"Retrieved Deezer match for Spotify {spotify_type} {spotify_id}: {row[0]}")
+                        return {'deezer_id': row[0]}
+                    return None
+        except Exception as e:
+            logger.error(f"Failed to retrieve Deezer match for Spotify {spotify_type} {spotify_id}: {str(e)}", exc_info=True)
+            return None
+
+    def save_mapping(self, spotify_type: str, spotify_id: str, deezer_id: Optional[int]) -> bool:
+        """Store the Deezer match of a Spotify item, None when there is no match"""
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                    INSERT INTO spotify_deezer_map (spotify_type, spotify_id, deezer_id)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (spotify_type, spotify_id) DO UPDATE
+                    SET deezer_id = EXCLUDED.deezer_id, matched_at = CURRENT_TIMESTAMP
+                    """, (spotify_type, spotify_id, deezer_id))
+                    conn.commit()
+                    logger.info(f"Stored Deezer match for Spotify {spotify_type} {spotify_id}: {deezer_id}")
+                    return True
+        except Exception as e:
+            logger.error(f"Failed to store Deezer match for Spotify {spotify_type} {spotify_id}: {str(e)}", exc_info=True)
+            return False
@@ -224,7 +224,32 @@ def setup_callback_routes(dp: Router, user_controller: UserController, download_
             page = int(page)
             user_id = callback_query.from_user.id
             logger.info(f"Processing view for user {user_id} - Type: {content_type}, Action: {action}")
-            
+
+            if content_type == "artist":
+                # Only the requested section page is loaded, usually from cache
+                success, section = await download_controller.get_artist_section(item_id, action, page)
+                if not success:
+                    logger.error(f"Failed to get artist {action} for user {user_id}")
+                    await callback_query.answer("Error getting item information")
+                    return
+                name = section['artist_name']
+                if action == "top_tracks":
+                    text = f"Top tracks by {name}:" if name else "Top tracks:"
+                elif action == "album":
+                    text = f"Albums by {name}:\n\n" if name else "Albums:\n\n"
+                else:
+                    text = f"Artists related to {name}:\n\n" if name else "Related artists:\n\n"
+                keyboard = MusicView.get_list_keyboard(
+                    section['items'], content_type, action, page, item_id, has_more=section['has_more']
+                )
+                await callback_query.message.edit_caption(
+                    caption=text,
+                    reply_markup=keyboard,
+                    parse_mode="Markdown"
+                )
+                await callback_query.answer()
+                return
+
             # Get item details
             success, item_info = await download_controller.get_item_info(content_type, item_id)
             if not success:
@@ -241,19 +266,6 @@ def setup_callback_routes(dp: Router, user_controller: UserController, download_
                 tracks = item_info.get('tracks', [])
                 text = f"Tracks in playlist '{item_info['name']}':"
                 keyboard = MusicView.get_list_keyboard(tracks, content_type, action, page, item_id)
-            elif content_type == "artist":
-                if action == "top_tracks":
-                    tracks = item_info['more_artist_info'].get('top_tracks', [])
-                    text = f"Top tracks by {item_info['name']}:"
-                    keyboard = MusicView.get_list_keyboard(tracks, content_type, action, page, item_id)
-                elif action == "album":
-                    albums = item_info['more_artist_info'].get('albums', [])
-                    text = f"Albums by {item_info['name']}:\n\n"
-                    keyboard = MusicView.get_list_keyboard(albums, content_type, action, page, item_id)
-                elif action == "related":
-                    related_artists = item_info['more_artist_info'].get('related_artists', [])
-                    text = f"Artists related to {item_info['name']}:\n\n"
-                    keyboard = MusicView.get_list_keyboard(related_artists, content_type, action, page, item_id)
             
             await callback_query.message.edit_caption(
                 caption=text,
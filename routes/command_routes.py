@@ -5,7 +5,7 @@ from aiogram.fsm.context import FSMContext
 
 from controllers.user_controller import UserController
 from controllers.playlist_controller import PlayListController
-from services.deezer_service import reload_arl
+from services.deezer_service import reload_arl, arl_pool
 from views.message_view import MessageView
 from views.playlist_view import PlaylistView
 from models.message_model import MessageModel
@@ -148,7 +148,7 @@ def setup_command_routes(dp: Router, user_controller: UserController, playlist_c
 
 *Supported Links:*
 • Deezer: Tracks, Albums, Playlists
-• Spotify: Tracks, Albums (Playlists coming soon)
+• Spotify: Tracks, Albums, Playlists
 
 *Need more help?*
 If you have any issues or questions, feel free to contact support."""
@@ -216,7 +216,10 @@ Thank you for using MusicDownloader Bot! 🎧"""
             # برای مثال، آن را در جایی ذخیره کنید یا اعتبارسنجی کنید
             logger.info(f"User {user_id} provided ARL: {arl}")
             await message.reply(f"توکن ARL شما با موفقیت دریافت شد: `{arl}`", parse_mode="MarkdownV2")
-            await reload_arl(arl)
+            if await reload_arl(arl):
+                await message.reply(f"تعداد نشست‌های فعال: {len(arl_pool.stats())}")
+            else:
+                await message.reply("هیچ‌کدام از توکن‌ها معتبر نبود، توکن‌های قبلی حفظ شد.")
         except Exception as e:
             logger.error(f"Error processing /about command for user {user_id}: {str(e)}", exc_info=True)
             # sm = await message.reply("Error displaying about information.")
@@ -52,15 +52,6 @@ def setup_message_routes(dp: Router, download_controller: DownloadController):
             status_message = await message.reply("⏳")
             logger.info(f"Sent processing status message to user {user_id}")
             
-            # Validate URL type
-            if "spotify" in url:
-                if 'playlist' in url:
-                    logger.warning(f"Spotify playlist not supported: {url}")
-                    sm = await message.reply(MessageView.get_error_message('spotify_playlist'))
-                    message_model.add_message(user_id, sm)
-                    await status_message.delete()
-                    return
-                    
             # Process download request
             logger.info(f"Starting download process for user {user_id}")
             success, result = await download_controller.process_download_request(
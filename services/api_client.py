@@ -0,0 +1,161 @@
+import asyncio
+import json
+import os
+import random
+from typing import Any, Dict, Optional
+import aiohttp
+from utils.rate_limiter import rate_limiter
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Base of the exponential backoff between retries, in seconds (full jitter is applied)
+API_BACKOFF = float(os.getenv('API_BACKOFF', '0.5'))
+# Bodies larger than this are decoded in a worker thread instead of on the event loop
+JSON_OFFLOAD_BYTES = 64 * 1024
+
+
+class ApiError(Exception):
+    """Raised when an upstream API answers with an error or cannot be reached"""
+
+    def __init__(self, message: str, code: Optional[int] = None, retryable: bool = False):
+        super().__init__(message)
+        self.code = code
+        self.retryable = retryable
+
+
+class ApiClient:
+    """
+    Async JSON API client with a pooled session, rate limiting and retries
+
+    429 answers pause the host's rate limit bucket for Retry-After and are
+    retried; 5xx answers, network errors and errors a subclass marks as
+    retryable are retried with jittered exponential backoff.
+    """
+
+    # Exception type raised by the client, subclasses use their own
+    error_class = ApiError
+
+    def __init__(self, name: str, base_url: str, host: str, connections: int, timeout: int, retries: int,
+                 max_retry_after: Optional[float] = None):
+        """
+        Initialize the client; the session is opened on first use
+
+        Args:
+            name (str): Name used in log and error messages
+            base_url (str): URL relative paths are appended to
+            host (str): Host whose rate limit buckets are used
+            connections (int): Pooled keep-alive connections
+            timeout (int): Total seconds a request may take
+            retries (int): Retries after the first attempt
+            max_retry_after (float): A 429 asking to wait longer fails instead of being retried
+        """
+        self.name = name
+        self.base_url = base_url
+        self.host = host
+        self.connections = connections
+        self.timeout = timeout
+        self.retries = retries
+        self.max_retry_after = max_retry_after
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Create the pooled session on first use"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.connections,
+                ttl_dns_cache=300,
+                keepalive_timeout=60
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'Accept': 'application/json'}
+            )
+            logger.info(f"{self.name} session opened ({self.connections} pooled connections)")
+        return self._session
+
+    async def _decode(self, body: bytes) -> Any:
+        if len(body) > JSON_OFFLOAD_BYTES:
+            return await asyncio.get_event_loop().run_in_executor(None, json.loads, body)
+        return json.loads(body)
+
+    def _error_message(self, body: bytes) -> str:
+        """Error text of a non-200 response body"""
+        return ''
+
+    def _check_body(self, path: str, data: Any) -> Any:
+        """Validate a decoded 200 response; raise error_class (retryable or not) for errors in it"""
+        return data
+
+    async def get(self, path: str, params: Dict[str, Any] = None, endpoint: str = 'metadata',
+                  headers: Dict[str, str] = None) -> Any:
+        """
+        GET an API path
+
+        Args:
+            path (str): Path relative to base_url, or an absolute URL such as a `next` link
+            params (dict): Query parameters
+            endpoint (str): Endpoint class used for rate limiting ('metadata' or 'search')
+            headers (dict): Extra request headers
+
+        Returns:
+            Any: Decoded JSON body
+
+        Raises:
+            ApiError: error_class, if the API returns an error or every attempt failed
+        """
+        url = path if path.startswith('http') else f"{self.base_url}/{path.lstrip('/')}"
+        last_error = None
+        backoff = False
+        for attempt in range(self.retries + 1):
+            # A 429 retries right away; the rate limiter pause covers the Retry-After wait
+            if backoff:
+                backoff = False
+                delay = random.uniform(0, API_BACKOFF * 2 ** attempt)
+                logger.warning(f"Retrying {self.name} {path} in {delay:.2f}s (attempt {attempt + 1}): {last_error}")
+                await asyncio.sleep(delay)
+
+            await rate_limiter.wait(self.host, endpoint)
+            try:
+                async with self._get_session().get(url, params=params, headers=headers) as response:
+                    if response.status == 429:
+                        retry_after = float(response.headers.get('Retry-After', 5))
+                        if self.max_retry_after is not None and retry_after > self.max_retry_after:
+                            # Hold other callers back only as long as they may wait, so they fail instead of stalling
+                            rate_limiter.pause(self.host, self.max_retry_after)
+                            raise self.error_class(f"{self.name} rate limit: retry after {retry_after:.0f}s", 429)
+                        # Pausing the bucket holds back every other caller as well
+                        rate_limiter.pause(self.host, retry_after)
+                        last_error = self.error_class("HTTP 429", 429)
+                        continue
+                    if response.status >= 500:
+                        last_error = self.error_class(f"HTTP {response.status}", response.status)
+                        backoff = True
+                        continue
+                    body = await response.read()
+                    if response.status != 200:
+                        raise self.error_class(
+                            f"{self.name} error for {path}: HTTP {response.status} {self._error_message(body)}".rstrip(),
+                            response.status
+                        )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+                backoff = True
+                continue
+
+            try:
+                return self._check_body(path, await self._decode(body))
+            except ApiError as e:
+                if not e.retryable:
+                    raise
+                last_error = e
+                backoff = True
+
+        raise self.error_class(f"{self.name} request {path} failed after {self.retries + 1} attempts: {last_error}")
+
+    async def close(self):
+        """Close the pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info(f"{self.name} session closed")
@@ -0,0 +1,262 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+from deezloader.deezloader import DeeLogin
+from utils.executor import BlockingExecutor, ExecutorQueueFull
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Consecutive failures after which a session is quarantined
+ARL_MAX_FAILURES = int(os.getenv('ARL_MAX_FAILURES', '3'))
+# First quarantine length in seconds, doubled on every repeated quarantine up to ARL_MAX_QUARANTINE
+ARL_QUARANTINE_SECONDS = int(os.getenv('ARL_QUARANTINE_SECONDS', '300'))
+ARL_MAX_QUARANTINE = int(os.getenv('ARL_MAX_QUARANTINE', '3600'))
+# Seconds between health checks that log quarantined sessions back in
+ARL_HEALTH_INTERVAL = int(os.getenv('ARL_HEALTH_INTERVAL', '60'))
+
+# deezloader errors meaning the ARL itself is expired or rejected
+SESSION_ERRORS = {'BadCredentials'}
+# deezloader errors about the requested content, which say nothing about the session
+CONTENT_ERRORS = {'TrackNotFound', 'AlbumNotFound', 'InvalidLink', 'NoDataApi', 'QualityNotFound'}
+# Errors raised on this side before deezloader runs, which say nothing about the session
+LOCAL_ERRORS = (ExecutorQueueFull, asyncio.CancelledError)
+# Error text of throttled requests
+THROTTLE_MARKERS = ('429', 'too many requests', 'rate limit', 'quota')
+
+
+class NoArlSession(Exception):
+    """Raised when the pool has no logged-in session"""
+
+
+class ArlSession:
+    """One logged-in DeeLogin and its health statistics"""
+
+    def __init__(self, arl: str, login: DeeLogin):
+        self.arl = arl
+        self.name = f"arl-{arl[:6]}…{arl[-4:]}"
+        self.login = login
+        self.in_flight = 0
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.busy_seconds = 0.0
+        self.quarantines = 0
+        self.quarantined_until = 0.0
+        self.last_error = None
+        self.retired = False
+
+    @property
+    def quarantined(self) -> bool:
+        return time.monotonic() < self.quarantined_until
+
+    def stats(self) -> Dict[str, Any]:
+        """Health and throughput of the session"""
+        calls = self.successes + self.failures
+        return {
+            'name': self.name,
+            'in_flight': self.in_flight,
+            'successes': self.successes,
+            'failures': self.failures,
+            'error_rate': self.failures / calls if calls else 0.0,
+            'avg_seconds': self.busy_seconds / calls if calls else None,
+            'quarantined_for': max(0, int(self.quarantined_until - time.monotonic())),
+            'last_error': self.last_error
+        }
+
+
+class ArlPool:
+    """
+    Pool of DeeLogin sessions, one per ARL
+
+    Calls are spread round-robin over healthy sessions. A session whose ARL
+    is rejected, or which keeps failing or gets throttled, is quarantined
+    with exponential backoff and logged in again by the health check. The
+    set of ARLs can be swapped at runtime; calls already running finish on
+    the session they started with.
+    """
+
+    def __init__(self, executor: BlockingExecutor):
+        """
+        Initialize an empty pool
+
+        Args:
+            executor (BlockingExecutor): Executor the blocking DeeLogin logins run in
+        """
+        self.executor = executor
+        self._sessions: List[ArlSession] = []
+        self._next = 0
+        self._arls: List[str] = []
+        self._started = False
+        self._last_start = -float(ARL_HEALTH_INTERVAL)
+        self._start_lock = asyncio.Lock()
+
+    def configure(self, arls: List[str]):
+        """Set the ARLs logged in on first use"""
+        self._arls = [arl.strip() for arl in arls if arl.strip()]
+
+    async def _ensure_started(self):
+        """
+        Log in the configured ARLs the first time a session is needed
+
+        A failed first login is retried by later calls (at most once per
+        ARL_HEALTH_INTERVAL, failing fast in between) and by the health check.
+        """
+        if self._started:
+            return
+        async with self._start_lock:
+            if self._started or time.monotonic() - self._last_start < ARL_HEALTH_INTERVAL:
+                return
+            self._last_start = time.monotonic()
+            # swap() marks the pool as started only when a login succeeded
+            await self.swap(self._arls)
+
+    async def _login(self, arl: str) -> Optional[DeeLogin]:
+        """Create a DeeLogin for an ARL, None if Deezer rejects it"""
+        try:
+            return await self.executor.run(DeeLogin, arl=arl)
+        except Exception as e:
+            logger.error(f"Failed to log in with ARL {arl[:6]}…: {str(e)}", exc_info=True)
+            return None
+
+    async def swap(self, arls: List[str]) -> bool:
+        """
+        Replace the pool's sessions with one per ARL
+
+        New sessions are logged in before the switch, so the pool is never
+        empty in between; sessions for ARLs that stay keep their login and
+        statistics. Nothing changes if none of the ARLs can log in.
+
+        Returns:
+            bool: True if the pool was swapped
+        """
+        current = {session.arl: session for session in self._sessions}
+        sessions = []
+        for arl in dict.fromkeys(arl.strip() for arl in arls if arl.strip()):
+            if arl in current and not current[arl].quarantined:
+                sessions.append(current[arl])
+                continue
+            login = await self._login(arl)
+            if login:
+                sessions.append(ArlSession(arl, login))
+
+        if not sessions:
+            logger.error("None of the ARLs could log in, keeping the current sessions")
+            return False
+
+        # A single assignment on the event loop, callers see the old or the new pool
+        kept = {session.arl for session in sessions}
+        for session in self._sessions:
+            if session.arl not in kept:
+                session.retired = True
+        self._sessions = sessions
+        self._next = 0
+        self._arls = [session.arl for session in sessions]
+        self._started = True
+        logger.info(f"ARL pool now has {len(sessions)} sessions: {', '.join(session.name for session in sessions)}")
+        return True
+
+    def _acquire(self) -> ArlSession:
+        """Pick the next healthy session round-robin"""
+        sessions = self._sessions
+        if not sessions:
+            raise NoArlSession("No Deezer session is available")
+
+        for _ in range(len(sessions)):
+            session = sessions[self._next % len(sessions)]
+            self._next += 1
+            if not session.quarantined:
+                return session
+
+        # Everything is quarantined: try the session that recovers first rather than failing outright
+        session = min(sessions, key=lambda candidate: candidate.quarantined_until)
+        logger.warning(f"All ARL sessions are quarantined, using {session.name}")
+        return session
+
+    @asynccontextmanager
+    async def session(self):
+        """
+        Borrow a session for one deezloader call
+
+        Example:
+            async with arl_pool.session() as session:
+                await executor.run(session.login.download_smart, url, ...)
+        """
+        await self._ensure_started()
+        session = self._acquire()
+        session.in_flight += 1
+        started = time.monotonic()
+        try:
+            yield session
+        except Exception as e:
+            session.busy_seconds += time.monotonic() - started
+            self._record_failure(session, e)
+            raise
+        else:
+            session.busy_seconds += time.monotonic() - started
+            session.successes += 1
+            session.consecutive_failures = 0
+            session.quarantines = 0
+        finally:
+            session.in_flight -= 1
+            if session.retired and session.in_flight == 0:
+                logger.info(f"Retired ARL session {session.name} finished its last call")
+
+    def _record_failure(self, session: ArlSession, error: Exception):
+        """Count a failed call and quarantine the session if the failure is its fault"""
+        error_name = type(error).__name__
+        if error_name in CONTENT_ERRORS or isinstance(error, LOCAL_ERRORS):
+            return
+
+        session.failures += 1
+        session.consecutive_failures += 1
+        session.last_error = f"{error_name}: {str(error)[:200]}"
+
+        message = str(error).lower()
+        if error_name in SESSION_ERRORS:
+            self._quarantine(session, "ARL rejected")
+        elif any(marker in message for marker in THROTTLE_MARKERS):
+            self._quarantine(session, "throttled")
+        elif session.consecutive_failures >= ARL_MAX_FAILURES:
+            self._quarantine(session, f"{session.consecutive_failures} failures in a row")
+
+    def _quarantine(self, session: ArlSession, reason: str):
+        """Take a session out of rotation with exponential backoff"""
+        seconds = min(ARL_QUARANTINE_SECONDS * 2 ** session.quarantines, ARL_MAX_QUARANTINE)
+        session.quarantines += 1
+        session.quarantined_until = time.monotonic() + seconds
+        logger.warning(f"Quarantined ARL session {session.name} for {seconds}s: {reason}")
+
+    async def check_health(self):
+        """Log in quarantined sessions again once their quarantine is over, or the whole pool if it is empty"""
+        if not self._sessions and self._arls:
+            async with self._start_lock:
+                if not self._sessions:
+                    logger.info("ARL pool is empty, logging in the configured ARLs again")
+                    await self.swap(self._arls)
+            return
+        for session in list(self._sessions):
+            if session.quarantined_until and not session.quarantined and session.consecutive_failures:
+                login = await self._login(session.arl)
+                if login:
+                    session.login = login
+                    session.consecutive_failures = 0
+                    session.quarantined_until = 0.0
+                    logger.info(f"ARL session {session.name} is healthy again")
+                else:
+                    self._quarantine(session, "login failed")
+
+    async def run_health_checks(self):
+        """Run check_health every ARL_HEALTH_INTERVAL seconds"""
+        while True:
+            await asyncio.sleep(ARL_HEALTH_INTERVAL)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.error(f"Error checking ARL sessions: {str(e)}", exc_info=True)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Health and throughput of every session in the pool"""
+        return [session.stats() for session in self._sessions]
@@ -0,0 +1,44 @@
+import os
+from typing import Any
+from services.api_client import ApiClient, ApiError
+from utils.rate_limiter import rate_limiter
+
+DEEZER_API_URL = 'https://api.deezer.com'
+DEEZER_API_HOST = 'api.deezer.com'
+# Pooled keep-alive connections to api.deezer.com
+DEEZER_API_CONNECTIONS = int(os.getenv('DEEZER_API_CONNECTIONS', '20'))
+DEEZER_API_TIMEOUT = int(os.getenv('DEEZER_API_TIMEOUT', '15'))
+DEEZER_API_RETRIES = int(os.getenv('DEEZER_API_RETRIES', '3'))
+
+# Error codes Deezer returns in a 200 body that are worth retrying: quota exceeded, service busy
+RETRYABLE_ERROR_CODES = {4, 700}
+
+
+class DeezerApiError(ApiError):
+    """Raised when the Deezer API answers with an error or cannot be reached"""
+
+
+class DeezerApiClient(ApiClient):
+    """Async client for the public Deezer API, which reports errors inside 200 responses"""
+
+    error_class = DeezerApiError
+
+    def __init__(self):
+        super().__init__(
+            'Deezer API', DEEZER_API_URL, DEEZER_API_HOST,
+            DEEZER_API_CONNECTIONS, DEEZER_API_TIMEOUT, DEEZER_API_RETRIES
+        )
+
+    def _check_body(self, path: str, data: Any) -> Any:
+        error = data.get('error') if isinstance(data, dict) else None
+        if not error:
+            return data
+        code = error.get('code') if isinstance(error, dict) else None
+        message = error.get('message') if isinstance(error, dict) else str(error)
+        if code in RETRYABLE_ERROR_CODES:
+            rate_limiter.pause(DEEZER_API_HOST, 5)
+            raise DeezerApiError(message, code, retryable=True)
+        raise DeezerApiError(f"Deezer API error for {path}: {message}", code)
+
+
+deezer_api = DeezerApiClient()
@@ -1,28 +1,74 @@
 import os
-import requests
 import re
-from deezloader.deezloader import DeeLogin
+import asyncio
 from deezloader.models.smart import Smart
 import json
 from dataclasses import dataclass
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, AsyncIterator, List
 from utils.file_handler import FileHandler
+from utils.executor import BlockingExecutor
+from utils.single_flight import SingleFlight
+from services.arl_pool import ArlPool, CONTENT_ERRORS
+from services.deezer_api import deezer_api
+from models.metadata_model import MetadataModel
+from models.spotify_map_model import SpotifyMapModel
+from services.spotify_service import SpotifyService
+from utils.ttl_cache import TTLCache
+from utils.rate_limiter import rate_limiter
 from logger import get_logger
 
 logger = get_logger(__name__)
 
+# All deezloader calls are blocking (network, decrypt, disk) and run in this pool
+DEEZER_WORKERS = int(os.getenv('DEEZER_WORKERS', '4'))
+DEEZER_QUEUE_SIZE = int(os.getenv('DEEZER_QUEUE_SIZE', '100'))
+deezer_executor = BlockingExecutor('deezer', max_workers=DEEZER_WORKERS, max_queue=DEEZER_QUEUE_SIZE)
+conversion_flights = SingleFlight('spotify conversion')
+DEEZER_API_HOST = 'api.deezer.com'
+# Album/playlist metadata and track list pages are cached in memory (LRU + TTL)
+METADATA_CACHE_SIZE = int(os.getenv('METADATA_CACHE_SIZE', '2000'))
+METADATA_TTL = int(os.getenv('METADATA_TTL', '3600'))
+# Also keep them in the deezer_metadata table so they survive restarts
+METADATA_PERSIST = os.getenv('METADATA_PERSIST', 'true').lower() == 'true'
+metadata_cache = TTLCache('deezer metadata', METADATA_CACHE_SIZE, METADATA_TTL)
+metadata_flights = SingleFlight('deezer metadata')
+# Spotify to Deezer matches are kept in spotify_deezer_map with an in-memory front cache;
+# no-match results expire sooner so items added to Deezer later are found
+SPOTIFY_MAP_CACHE_SIZE = int(os.getenv('SPOTIFY_MAP_CACHE_SIZE', '10000'))
+SPOTIFY_MAP_TTL = int(os.getenv('SPOTIFY_MAP_TTL', str(24 * 3600)))
+SPOTIFY_MAP_NEGATIVE_TTL = int(os.getenv('SPOTIFY_MAP_NEGATIVE_TTL', str(6 * 3600)))
+spotify_map_cache = TTLCache('spotify map', SPOTIFY_MAP_CACHE_SIZE, SPOTIFY_MAP_TTL)
+# Spotify playlist tracks resolved to Deezer at the same time, and how many
+# resolved IDs are handed to the download pipeline at once
+CONVERSION_WORKERS = int(os.getenv('CONVERSION_WORKERS', '8'))
+CONVERSION_CHUNK = int(os.getenv('CONVERSION_CHUNK', '5'))
+# Tracks requested per page of an album/playlist track list (Deezer allows up to 100)
+TRACK_PAGE_SIZE = int(os.getenv('TRACK_PAGE_SIZE', '100'))
+
 arl = "3bc1b698b6a71d212c0478f1037b1fa4a381134ca51ece628b00d5845ec19d2e3b284bce69688ffa570705b0f9e14d290e2d9f447421b0ab3732d5230455d86e03e0ed568922ae5fcd806ac87d0ea60b5ee2306fa740825e6f097b8732343b15"#os.getenv('DEEZER_ARL')
-deedownload = DeeLogin(arl=arl)
+# Comma separated ARLs, each one becomes a session of the pool (logged in on first use)
+DEEZER_ARLS = os.getenv('DEEZER_ARLS', os.getenv('DEEZER_ARL', arl)).split(',')
+arl_pool = ArlPool(deezer_executor)
+arl_pool.configure(DEEZER_ARLS)
+
+def split_arls(text):
+    """Split ARLs separated by commas or whitespace"""
+    return [arl for arl in re.split(r'[\s,]+', text or '') if arl]
 
 async def reload_arl(arl):
-    """Reload ARL token from file"""
+    """Swap the ARL sessions for the given ARL(s) without interrupting running downloads"""
     try:
-        global deedownload
-        deedownload = DeeLogin(arl=arl)
-        logger.info("Successfully reloaded ARL token")
+        if await arl_pool.swap(split_arls(arl)):
+            logger.info("Successfully reloaded ARL token")
+            return True
+        return False
 
     except Exception as e:
         logger.error(f"Error reloading ARL token: {str(e)}", exc_info=True)
+        return False
+class NoDeezerMatch(Exception):
+    """Raised when a Spotify item has no Deezer equivalent"""
+
 @dataclass
 class DownloadResult:
     success: bool
@@ -33,6 +79,9 @@ class DownloadResult:
 class DeezerService:
     def __init__(self):
         self.file_handler = FileHandler()
+        self.metadata_model = MetadataModel()
+        self.spotify_map_model = SpotifyMapModel()
+        self.spotify_service = SpotifyService()
         logger.info("DeezerService initialized")
     
     async def download(self, url: str, output_folder="downloads", quality_download: str = 'MP3_320', make_zip: bool = False) -> Smart:
@@ -46,7 +95,11 @@ class DeezerService:
                 return DownloadResult(False, error="Invalid Deezer URL")
 
             logger.info(f"Downloading {content_type} with ID: {deezer_id}")
-            smart = deedownload.download_smart(url, output_folder, quality_download=quality_download, make_zip=make_zip)
+            async with arl_pool.session() as session:
+                smart = await deezer_executor.run(
+                    session.login.download_smart, url, output_folder,
+                    quality_download=quality_download, make_zip=make_zip
+                )
             logger.info(f"Successfully downloaded {content_type} - ID: {deezer_id}")
             return smart
 
@@ -78,22 +131,39 @@ class DeezerService:
             logger.error(f"Error extracting info from URL {url}: {str(e)}", exc_info=True)
             return None, None
 
-    def get_deezer_info(self, content_type, deezer_id):
+    async def get_deezer_info(self, content_type, deezer_id):
         """Get information from Deezer API"""
         try:
-            url = f"https://api.deezer.com/{content_type}/{deezer_id}"
-            response = requests.get(url)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                error_msg = f"Failed to get Deezer info: HTTP {response.status_code}"
-                logger.error(error_msg)
-                raise Exception(error_msg)
+            return await self.get_metadata(f"{content_type}/{deezer_id}")
     
         except Exception as e:
             logger.error(f"Error getting Deezer info for {content_type} {deezer_id}: {str(e)}", exc_info=True)
             raise
 
+    async def get_metadata(self, path: str) -> Dict[str, Any]:
+        """
+        Get a Deezer API response through the metadata cache
+
+        Concurrent misses for the same path share a single lookup, which
+        reads the deezer_metadata table before calling the API.
+        """
+        data = metadata_cache.get(path)
+        if data is not None:
+            return data
+        return await metadata_flights.do(path, self._load_metadata, path)
+
+    async def _load_metadata(self, path: str) -> Dict[str, Any]:
+        """Load a response from the persistent table or the API and cache it"""
+        data = self.metadata_model.get_metadata(path, METADATA_TTL) if METADATA_PERSIST else None
+        if data is None:
+            data = await deezer_api.get(path)
+            if METADATA_PERSIST:
+                self.metadata_model.save_metadata(path, data)
+        metadata_cache.set(path, data)
+        stats = metadata_cache.stats()
+        logger.info(f"Deezer metadata cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+        return data
+
     async def create_zip(self, file_path: str, title: str) -> Optional[str]:
         """Create ZIP archive for album/playlist"""
         try:
@@ -113,42 +183,199 @@ class DeezerService:
     
     async def get_track_list(self, content_type: str, deezer_id: int) -> list:
         """Get list of track IDs from album or playlist"""
+        track_ids = []
+        async for page in self.iter_track_pages(content_type, deezer_id):
+            track_ids.extend(page)
+        logger.info(f"Retrieved {len(track_ids)} tracks from {content_type} {deezer_id}")
+        return track_ids
+
+    async def iter_track_pages(self, content_type: str, deezer_id: int) -> AsyncIterator[List[int]]:
+        """
+        Yield the track IDs of a track, album or playlist page by page
+
+        Follows the `next` links of /{content_type}/{id}/tracks, so large
+        playlists are read completely and consumers can start on the first
+        page while later ones are still being fetched.
+        """
         try:
             logger.info(f"Getting track list for {content_type} {deezer_id}")
             
             if content_type == 'track':
                 logger.info(f"Single track requested: {deezer_id}")
-                return [deezer_id]
-            
-            elif content_type in ['album', 'playlist']:
-                info = self.get_deezer_info(content_type, deezer_id)
-                if "tracks" in info:
-                    track_ids = [track['id'] for track in info['tracks']['data']]
-                    logger.info(f"Retrieved {len(track_ids)} tracks from {content_type} {deezer_id}")
-                    return track_ids
-                else:
-                    # print(f"Error: {info}")
-                    # logger.error(f"Error retrieving track list: {info}")
-                    error_msg = f"error in getting track list: {content_type} {deezer_id}"
-                    logger.error(error_msg)
-                    raise ValueError(error_msg)
-            else:
+                yield [deezer_id]
+                return
+
+            if content_type not in ['album', 'playlist']:
                 error_msg = f"Invalid content type: {content_type}"
                 logger.error(error_msg)
                 raise ValueError(error_msg)
+
+            path = f"{content_type}/{deezer_id}/tracks?index=0&limit={TRACK_PAGE_SIZE}"
+            page_number = 0
+            while path:
+                page = await self.get_metadata(path)
+                if 'data' not in page:
+                    error_msg = f"error in getting track list: {content_type} {deezer_id}"
+                    logger.error(error_msg)
+                    raise ValueError(error_msg)
+
+                page_number += 1
+                track_ids = [track['id'] for track in page['data'] if track.get('id')]
+                logger.info(f"Retrieved page {page_number} of {content_type} {deezer_id}: {len(track_ids)} tracks")
+                if track_ids:
+                    yield track_ids
+                path = page.get('next')
                 
         except Exception as e:
             logger.error(f"Error getting track list for {content_type} {deezer_id}: {str(e)}", exc_info=True)
             raise
     
-    def convert_to_deezer(self, url):
+    async def convert_to_deezer(self, url):
         try:
-            if 'track' in url:
-                url = deedownload.convert_spoty_to_dee_link_track(url)
-            elif 'album' in url:
-                url = deedownload.convert_spoty_to_dee_link_album(url)
-        
-            return url
+            key = self.extract_spotify_info(url)
+            if key:
+                deezer_url = self._get_spotify_match(*key)
+                if deezer_url == '':
+                    raise NoDeezerMatch(f"No Deezer match for Spotify {key[0]} {key[1]}")
+                if deezer_url:
+                    return deezer_url
+
+            # Identical links converted at the same moment share one lookup. The flight may be a
+            # playlist track resolve, which reports a missing match as '' instead of raising
+            deezer_url = await conversion_flights.do(key or url, self._convert_to_deezer, url, key)
+            if not deezer_url:
+                raise NoDeezerMatch(f"No Deezer match for {url}")
+            return deezer_url
         except Exception as e:
             logger.error(f"Error converting {url}: {str(e)}", exc_info=True)
-            raise
\ No newline at end of file
+            raise
+
+    def extract_spotify_info(self, url: str) -> Optional[Tuple[str, str]]:
+        """Extract (content type, Spotify ID) from a Spotify URL"""
+        match = re.search(r'open\.spotify\.com/(?:intl-[a-z]+/)?(track|album|playlist|artist)/([A-Za-z0-9]+)', url)
+        return (match.group(1), match.group(2)) if match else None
+
+    def _get_spotify_match(self, spotify_type: str, spotify_id: str) -> Optional[str]:
+        """
+        Look up a known Deezer match in the front cache, then in spotify_deezer_map
+
+        Returns:
+            str: Deezer URL, '' if the item is known to have no match, None if unknown
+        """
+        key = (spotify_type, spotify_id)
+        deezer_url = spotify_map_cache.get(key)
+        if deezer_url is not None:
+            return deezer_url
+
+        mapping = self.spotify_map_model.get_mapping(spotify_type, spotify_id, SPOTIFY_MAP_NEGATIVE_TTL)
+        if mapping is None:
+            return None
+        if mapping['deezer_id'] is None:
+            spotify_map_cache.set(key, '', ttl=SPOTIFY_MAP_NEGATIVE_TTL)
+            return ''
+        deezer_url = f"https://www.deezer.com/{spotify_type}/{mapping['deezer_id']}"
+        spotify_map_cache.set(key, deezer_url)
+        return deezer_url
+
+    def _save_spotify_match(self, spotify_type: str, spotify_id: str, deezer_id: Optional[int]):
+        """Remember a Deezer match (or the lack of one) in both cache levels"""
+        self.spotify_map_model.save_mapping(spotify_type, spotify_id, deezer_id)
+        if deezer_id is None:
+            spotify_map_cache.set((spotify_type, spotify_id), '', ttl=SPOTIFY_MAP_NEGATIVE_TTL)
+        else:
+            spotify_map_cache.set((spotify_type, spotify_id), f"https://www.deezer.com/{spotify_type}/{deezer_id}")
+
+    async def _convert_to_deezer(self, url, key=None):
+        """Convert a Spotify URL and record the outcome in spotify_deezer_map"""
+        try:
+            deezer_url = await self._lookup_deezer_equivalent(url)
+        except Exception as e:
+            if key and type(e).__name__ in CONTENT_ERRORS:
+                self._save_spotify_match(*key, None)
+            raise
+
+        _, deezer_id = self.extract_info_from_url(deezer_url or '')
+        if key and deezer_id:
+            self._save_spotify_match(*key, deezer_id)
+        return deezer_url
+
+    async def iter_spotify_playlist_pages(self, playlist_id: str) -> AsyncIterator[List[int]]:
+        """
+        Yield the Deezer track IDs of a Spotify playlist in playlist order
+
+        Playlist pages are streamed from Spotify and their tracks resolved
+        concurrently (CONVERSION_WORKERS at a time). Resolved IDs are yielded
+        in chunks of CONVERSION_CHUNK as soon as they and every earlier track
+        are done, so downloads start while the rest is still converting.
+        Tracks without a Deezer match are skipped.
+        """
+        semaphore = asyncio.Semaphore(CONVERSION_WORKERS)
+
+        async def resolve(track):
+            async with semaphore:
+                return await self.resolve_spotify_track(track)
+
+        resolved = missing = 0
+        async for tracks in self.spotify_service.iter_playlist_tracks(playlist_id):
+            tasks = [asyncio.create_task(resolve(track)) for track in tracks]
+            try:
+                chunk = []
+                for task in tasks:
+                    deezer_id = await task
+                    if not deezer_id:
+                        missing += 1
+                        continue
+                    chunk.append(deezer_id)
+                    if len(chunk) >= CONVERSION_CHUNK:
+                        resolved += len(chunk)
+                        yield chunk
+                        chunk = []
+                if chunk:
+                    resolved += len(chunk)
+                    yield chunk
+            finally:
+                for task in tasks:
+                    task.cancel()
+        logger.info(f"Converted Spotify playlist {playlist_id}: {resolved} tracks found on Deezer, {missing} missing")
+
+    async def resolve_spotify_track(self, track: Dict[str, Any]) -> Optional[int]:
+        """
+        Get the Deezer ID of a Spotify track object through the match caches
+
+        Returns:
+            int: Deezer track ID, or None if there is no match
+        """
+        key = ('track', track['id'])
+        try:
+            deezer_url = self._get_spotify_match(*key)
+            if deezer_url is None:
+                deezer_url = await conversion_flights.do(key, self._resolve_track_object, track, key)
+            _, deezer_id = self.extract_info_from_url(deezer_url) if deezer_url else (None, None)
+            return deezer_id
+        except Exception as e:
+            logger.error(f"Error resolving Spotify track {track['id']}: {str(e)}", exc_info=True)
+            return None
+
+    async def _resolve_track_object(self, track, key):
+        """Match a Spotify track object by ISRC or ranked search and remember the result"""
+        deezer_url = await self.spotify_service.find_deezer_url('track', track)
+        _, deezer_id = self.extract_info_from_url(deezer_url) if deezer_url else (None, None)
+        self._save_spotify_match(*key, deezer_id)
+        return deezer_url or ''
+
+    async def _lookup_deezer_equivalent(self, url):
+        """Find the Deezer URL of a Spotify track/album remotely"""
+        # ISRC/UPC lookup with a ranked search fallback
+        deezer_url = await self.spotify_service.convert_to_deezer_url(url)
+        if deezer_url:
+            return deezer_url
+
+        # Last resort: deezloader looks the item up on Spotify, then searches Deezer for it
+        await rate_limiter.wait('api.spotify.com', 'metadata')
+        await rate_limiter.wait(DEEZER_API_HOST, 'search')
+        async with arl_pool.session() as session:
+            if 'track' in url:
+                url = await deezer_executor.run(session.login.convert_spoty_to_dee_link_track, url)
+            elif 'album' in url:
+                url = await deezer_executor.run(session.login.convert_spoty_to_dee_link_album, url)
+        return url
\ No newline at end of file
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+import aiohttp
+from services.api_client import ApiClient, ApiError
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+SPOTIFY_API_URL = 'https://api.spotify.com/v1'
+SPOTIFY_API_HOST = 'api.spotify.com'
+SPOTIFY_TOKEN_URL = 'https://accounts.spotify.com/api/token'
+# Pooled keep-alive connections to the Spotify Web API
+SPOTIFY_API_CONNECTIONS = int(os.getenv('SPOTIFY_API_CONNECTIONS', '20'))
+SPOTIFY_API_TIMEOUT = int(os.getenv('SPOTIFY_API_TIMEOUT', '15'))
+SPOTIFY_API_RETRIES = int(os.getenv('SPOTIFY_API_RETRIES', '3'))
+# A 429 asking to wait longer than this (seconds) fails the request instead of stalling it
+SPOTIFY_MAX_RETRY_AFTER = int(os.getenv('SPOTIFY_MAX_RETRY_AFTER', '30'))
+# Seconds before expiry at which the access token is renewed
+TOKEN_REFRESH_MARGIN = 60
+
+
+class SpotifyApiError(ApiError):
+    """Raised when the Spotify Web API answers with an error or cannot be reached"""
+
+
+class SpotifyApiClient(ApiClient):
+    """
+    Async client for the Spotify Web API using the client credentials flow
+
+    The access token is fetched on first use and renewed shortly before it
+    expires; concurrent callers wait for a single renewal.
+    """
+
+    error_class = SpotifyApiError
+
+    def __init__(self):
+        super().__init__(
+            'Spotify API', SPOTIFY_API_URL, SPOTIFY_API_HOST,
+            SPOTIFY_API_CONNECTIONS, SPOTIFY_API_TIMEOUT, SPOTIFY_API_RETRIES,
+            max_retry_after=SPOTIFY_MAX_RETRY_AFTER
+        )
+        self.client_id = None
+        self.client_secret = None
+        self._token = None
+        self._token_expires = 0.0
+        self._token_lock = asyncio.Lock()
+
+    def configure(self, client_id: str, client_secret: str):
+        """Set the app credentials; a change drops the current token"""
+        if (client_id, client_secret) != (self.client_id, self.client_secret):
+            self.client_id = client_id
+            self.client_secret = client_secret
+            self._token = None
+
+    async def _get_token(self, stale: Optional[str] = None) -> str:
+        """
+        Get a valid access token, requesting a new one if needed
+
+        Args:
+            stale (str): Token the API just rejected; it is renewed even if not expired yet
+        """
+        if self._token and self._token != stale and time.monotonic() < self._token_expires:
+            return self._token
+
+        async with self._token_lock:
+            # Another caller may have renewed it while this one waited for the lock
+            if self._token and self._token != stale and time.monotonic() < self._token_expires:
+                return self._token
+            if not self.client_id or not self.client_secret:
+                raise SpotifyApiError("Spotify credentials are not configured")
+
+            try:
+                async with self._get_session().post(
+                    SPOTIFY_TOKEN_URL,
+                    data={'grant_type': 'client_credentials'},
+                    auth=aiohttp.BasicAuth(self.client_id, self.client_secret)
+                ) as response:
+                    if response.status != 200:
+                        raise SpotifyApiError(f"Failed to get Spotify token: HTTP {response.status}", response.status)
+                    data = await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise SpotifyApiError(f"Failed to get Spotify token: {str(e)}")
+
+            self._token = data['access_token']
+            self._token_expires = time.monotonic() + int(data.get('expires_in', 3600)) - TOKEN_REFRESH_MARGIN
+            logger.info("Spotify access token renewed")
+            return self._token
+
+    def _error_message(self, body: bytes) -> str:
+        try:
+            return json.loads(body)['error']['message']
+        except Exception:
+            return ''
+
+    async def get(self, path: str, params: Dict[str, Any] = None, endpoint: str = 'metadata',
+                  headers: Dict[str, str] = None) -> Any:
+        """
+        GET a Spotify Web API path, e.g. "albums/4aawyAB9vmqN3uQ7FjRGTy", with a bearer token
+
+        A 401 (token revoked or expired early) renews the token once and repeats the request.
+        """
+        token = await self._get_token()
+        try:
+            return await super().get(path, params, endpoint, headers=dict(headers or {}, Authorization=f"Bearer {token}"))
+        except SpotifyApiError as e:
+            if e.code != 401:
+                raise
+        token = await self._get_token(stale=token)
+        return await super().get(path, params, endpoint, headers=dict(headers or {}, Authorization=f"Bearer {token}"))
+
+
+spotify_api = SpotifyApiClient()
@@ -1,13 +1,76 @@
+import asyncio
 import os
-import requests
+import re
 import json
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-from typing import Optional, Dict, Any, List
+from difflib import SequenceMatcher
+from typing import Optional, Dict, Any, AsyncIterator, List, Tuple
+from services.deezer_api import deezer_api, DeezerApiError
+from services.spotify_api import spotify_api
+from utils.micro_batcher import MicroBatcher
+from utils.single_flight import SingleFlight
+from utils.ttl_cache import TTLCache
 from logger import get_logger
 
 logger = get_logger(__name__)
 
+# Spotify external_ids key Deezer can look items up by
+EXTERNAL_ID_KEYS = {
+    'track': 'isrc',
+    'album': 'upc'
+}
+# Error code of Deezer's "no data" answer
+DEEZER_NO_DATA = 800
+# Deezer search results ranked per query, and the score a result needs to be accepted
+SEARCH_CANDIDATES = 10
+SEARCH_MATCH_THRESHOLD = float(os.getenv('SEARCH_MATCH_THRESHOLD', '0.75'))
+# Items per Spotify playlist page (the API maximum)
+PLAYLIST_PAGE_SIZE = 100
+# Most IDs the Spotify multi-get endpoints accept per call
+SPOTIFY_BATCH_LIMITS = {
+    'track': 50,
+    'album': 20,
+    'artist': 50
+}
+# Seconds single-item lookups are collected before they are sent as one multi-get
+SPOTIFY_BATCH_WINDOW = float(os.getenv('SPOTIFY_BATCH_WINDOW', '0.02'))
+# Seconds each artist card request may take; a section that is slower is left out
+ARTIST_SECTION_TIMEOUT = float(os.getenv('ARTIST_SECTION_TIMEOUT', '5'))
+# Artist objects and artist card sections (top tracks, albums, related artists) are
+# loaded on demand and cached separately, albums page by page
+ARTIST_SECTION_CACHE_SIZE = int(os.getenv('ARTIST_SECTION_CACHE_SIZE', '2000'))
+ARTIST_SECTION_TTL = int(os.getenv('ARTIST_SECTION_TTL', '3600'))
+# Items per page of an artist section, the same as a list page in MusicView
+ARTIST_SECTION_PAGE_SIZE = 8
+ARTIST_SECTIONS = ('top_tracks', 'album', 'related')
+artist_section_cache = TTLCache('spotify artist sections', ARTIST_SECTION_CACHE_SIZE, ARTIST_SECTION_TTL)
+artist_section_flights = SingleFlight('spotify artist sections')
+
+
+def _normalize_title(text: str) -> str:
+    """Lowercase a title and drop bracketed parts and punctuation for comparison"""
+    text = re.sub(r'[\(\[].*?[\)\]]', '', text.lower())
+    text = re.sub(r'\s+-\s+.*(remaster|version|edit|live|mix).*$', '', text)
+    return re.sub(r'[^\w]+', ' ', text).strip()
+
+
+def _multi_get(item_type: str):
+    """Build the bulk fetch of a MicroBatcher for one Spotify multi-get endpoint"""
+    endpoint = f"{item_type}s"
+
+    async def fetch(ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        items = (await spotify_api.get(endpoint, params={'ids': ','.join(ids)}))[endpoint]
+        # Unknown IDs come back as null, in request order
+        return {item_id: item for item_id, item in zip(ids, items) if item}
+
+    return fetch
+
+
+# Shared by every SpotifyService, so lookups from all of them end up in the same multi-get
+spotify_batchers = {
+    item_type: MicroBatcher(f"spotify {item_type}", _multi_get(item_type), limit, SPOTIFY_BATCH_WINDOW)
+    for item_type, limit in SPOTIFY_BATCH_LIMITS.items()
+}
+
 class SpotifyService:
     def __init__(self):
         """Initialize SpotifyService with API credentials"""
@@ -19,106 +82,195 @@ class SpotifyService:
                 logger.error("Spotify credentials not found in environment variables")
                 raise ValueError("Missing Spotify credentials")
             
-            self.sp = spotipy.Spotify(
-                auth_manager=SpotifyClientCredentials(
-                    client_id=self.client_id,
-                    client_secret=self.client_secret
-                )
-            )
+            # The token is requested on the first call, without blocking the event loop
+            spotify_api.configure(self.client_id, self.client_secret)
             logger.info("SpotifyService initialized successfully")
             
         except Exception as e:
             logger.error(f"Failed to initialize SpotifyService: {str(e)}", exc_info=True)
             raise
 
-    def convert_to_deezer_url(self, spotify_url: str) -> Optional[str]:
+    async def artist_top_tracks(self, artist_id: str, country: str = 'US') -> Dict[str, Any]:
+        """Get the raw top tracks response of an artist"""
+        return await spotify_api.get(f"artists/{artist_id}/top-tracks", params={'market': country})
+
+    async def artist_albums(self, artist_id: str, album_type: str = 'album', limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """Get a raw page of an artist's albums"""
+        return await spotify_api.get(
+            f"artists/{artist_id}/albums",
+            params={'include_groups': album_type, 'limit': limit, 'offset': offset}
+        )
+
+    async def artist_related_artists(self, artist_id: str) -> Dict[str, Any]:
+        """Get the raw related artists response of an artist"""
+        return await spotify_api.get(f"artists/{artist_id}/related-artists")
+
+    async def _get_item(self, item_type: str, item_id: str) -> Dict[str, Any]:
+        """
+        Get a track, album or artist object through the multi-get batcher
+
+        Raises:
+            ValueError: If Spotify has no item with that ID
+        """
+        item = await spotify_batchers[item_type].load(item_id)
+        if item is None:
+            raise ValueError(f"Spotify {item_type} {item_id} not found")
+        return item
+
+    async def convert_to_deezer_url(self, spotify_url: str) -> Optional[str]:
         """Convert Spotify URL to Deezer URL"""
         try:
             logger.info(f"Converting Spotify URL to Deezer URL: {spotify_url}")
             
             # Extract Spotify ID and type
-            if 'track' in spotify_url:
-                spotify_id = spotify_url.split('track/')[1].split('?')[0]
-                logger.info(f"Extracted Spotify track ID: {spotify_id}")
-                
-                track_info = self.sp.track(spotify_id)
-                query = f"{track_info['name']} {track_info['artists'][0]['name']}"
-                logger.info(f"Searching Deezer for track: {query}")
-                
-                deezer_url = self._search_on_deezer('track', query)
-                if not deezer_url:
-                    logger.error(f"No Deezer equivalent found for Spotify track: {query}")
-                    return None
-                    
-                logger.info(f"Found Deezer equivalent: {deezer_url}")
-                return deezer_url
-                
-            elif 'album' in spotify_url:
-                spotify_id = spotify_url.split('album/')[1].split('?')[0]
-                logger.info(f"Extracted Spotify album ID: {spotify_id}")
-                
-                album_info = self.sp.album(spotify_id)
-                query = f"{album_info['name']} {album_info['artists'][0]['name']}"
-                logger.info(f"Searching Deezer for album: {query}")
-                
-                deezer_url = self._search_on_deezer('album', query)
-                if not deezer_url:
-                    logger.error(f"No Deezer equivalent found for Spotify album: {query}")
-                    return None
-                    
-                logger.info(f"Found Deezer equivalent: {deezer_url}")
-                return deezer_url
-                
-            logger.error(f"Unsupported Spotify URL format: {spotify_url}")
-            return None
+            match = re.search(r'(track|album)/([A-Za-z0-9]+)', spotify_url)
+            if not match:
+                logger.error(f"Unsupported Spotify URL format: {spotify_url}")
+                return None
+
+            content_type, spotify_id = match.groups()
+            logger.info(f"Extracted Spotify {content_type} ID: {spotify_id}")
+            item = await self._get_item(content_type, spotify_id)
+            return await self.find_deezer_url(content_type, item)
             
         except Exception as e:
             logger.error(f"Error converting Spotify URL {spotify_url}: {str(e)}", exc_info=True)
             return None
 
-    def _search_on_deezer(self, content_type: str, query: str) -> Optional[str]:
-        """Search for content on Deezer"""
+    async def find_deezer_url(self, content_type: str, item: Dict[str, Any]) -> Optional[str]:
+        """
+        Find the Deezer equivalent of a Spotify track/album object
+
+        The ISRC (tracks) or UPC (albums) from external_ids is looked up
+        directly; a ranked text search is only used when that finds nothing.
+
+        Returns:
+            str: Deezer URL, or None if nothing matches well enough
+
+        Raises:
+            Exception: If a lookup failed, so a failure is not mistaken for a missing item
+        """
+        deezer_url = await self._lookup_by_external_id(content_type, item)
+        if deezer_url:
+            logger.info(f"Found Deezer equivalent by {EXTERNAL_ID_KEYS[content_type]}: {deezer_url}")
+            return deezer_url
+
+        deezer_url = await self._search_on_deezer(content_type, item)
+        if not deezer_url:
+            logger.error(f"No Deezer equivalent found for Spotify {content_type}: {item.get('name')}")
+            return None
+
+        logger.info(f"Found Deezer equivalent: {deezer_url}")
+        return deezer_url
+
+    async def _lookup_by_external_id(self, content_type: str, item: Dict[str, Any]) -> Optional[str]:
+        """Look a track up by ISRC or an album by UPC with a single Deezer request"""
+        id_key = EXTERNAL_ID_KEYS.get(content_type)
+        external_id = (item.get('external_ids') or {}).get(id_key)
+        if not external_id:
+            return None
         try:
-            logger.info(f"Searching Deezer - Type: {content_type}, Query: {query}")
-            
-            response = requests.get(
-                'https://api.deezer.com/search',
-                params={'q': query, 'type': content_type}
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                total_results = data.get('total', 0)
-                logger.info(f"Found {total_results} results on Deezer")
-                
-                if total_results > 0 and data.get('data'):
-                    item = data['data'][0]
-                    if 'id' in item:
-                        deezer_url = f"https://www.deezer.com/{content_type}/{item['id']}"
-                        logger.info(f"Selected first result: {deezer_url}")
-                        return deezer_url
-                        
-                logger.warning(f"No valid results found on Deezer for query: {query}")
-                return None
-                
-            else:
-                logger.error(f"Deezer API request failed: HTTP {response.status_code}")
-                return None
+            data = await deezer_api.get(f"{content_type}/{id_key}:{external_id}")
+            if data.get('id'):
+                return f"https://www.deezer.com/{content_type}/{data['id']}"
+        except DeezerApiError as e:
+            # Deezer answers unknown codes with a "no data" error, anything else is a real failure
+            if e.code != DEEZER_NO_DATA:
+                raise
+            logger.info(f"No Deezer {content_type} for {id_key} {external_id}")
+        return None
+
+    async def _search_on_deezer(self, content_type: str, item: Dict[str, Any]) -> Optional[str]:
+        """Search for content on Deezer and pick the best ranked result"""
+        try:
+            name = item['name']
+            artist = item['artists'][0]['name']
+            queries = [
+                f'artist:"{artist}" {content_type}:"{name}"',
+                f"{name} {artist}"
+            ]
+            for query in queries:
+                logger.info(f"Searching Deezer - Type: {content_type}, Query: {query}")
+                data = await deezer_api.get(
+                    f"search/{content_type}", params={'q': query, 'limit': SEARCH_CANDIDATES}, endpoint='search'
+                )
+                candidates = data.get('data') or []
+                logger.info(f"Found {data.get('total', 0)} results on Deezer")
+
+                best, score = self._rank_candidates(content_type, candidates, item)
+                if best and score >= SEARCH_MATCH_THRESHOLD:
+                    deezer_url = f"https://www.deezer.com/{content_type}/{best['id']}"
+                    logger.info(f"Selected result with score {score:.2f}: {deezer_url}")
+                    return deezer_url
+                    
+            logger.warning(f"No valid results found on Deezer for {content_type}: {name} - {artist}")
+            return None
                 
         except Exception as e:
-            logger.error(f"Error searching Deezer for {content_type} - {query}: {str(e)}", exc_info=True)
-            return None
+            logger.error(f"Error searching Deezer for {content_type} - {item.get('name')}: {str(e)}", exc_info=True)
+            raise
+
+    def _rank_candidates(self, content_type: str, candidates: List[Dict[str, Any]], item: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], float]:
+        """
+        Score Deezer search results against a Spotify object
+
+        Title similarity weighs most, then the artist, then the duration
+        (tracks) or track count (albums).
+
+        Returns:
+            tuple: (best candidate, its score between 0 and 1)
+        """
+        name = _normalize_title(item['name'])
+        artist = _normalize_title(item['artists'][0]['name'])
+        best, best_score = None, 0.0
+        for candidate in candidates:
+            if not candidate.get('id'):
+                continue
+            score = 0.6 * SequenceMatcher(None, name, _normalize_title(candidate.get('title', ''))).ratio()
+            candidate_artist = (candidate.get('artist') or {}).get('name', '')
+            score += 0.3 * SequenceMatcher(None, artist, _normalize_title(candidate_artist)).ratio()
+            if content_type == 'track' and item.get('duration_ms') and candidate.get('duration'):
+                difference = abs(candidate['duration'] - item['duration_ms'] / 1000)
+                score += 0.1 * max(0.0, 1 - difference / 10)
+            elif content_type == 'album' and item.get('total_tracks') and candidate.get('nb_tracks'):
+                score += 0.1 if candidate['nb_tracks'] == item['total_tracks'] else 0.0
+            if score > best_score:
+                best, best_score = candidate, score
+        return best, best_score
+
+    async def iter_playlist_tracks(self, playlist_id: str) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Yield the track objects of a Spotify playlist page by page
+
+        Local files, removed tracks and podcast episodes are skipped.
+        """
+        offset = 0
+        while True:
+            page = await spotify_api.get(
+                f"playlists/{playlist_id}/tracks",
+                params={'limit': PLAYLIST_PAGE_SIZE, 'offset': offset, 'additional_types': 'track'}
+            )
+            tracks = [
+                item['track'] for item in page['items']
+                if item.get('track') and item['track'].get('type') == 'track'
+                and item['track'].get('id') and not item.get('is_local')
+            ]
+            logger.info(f"Retrieved {len(tracks)} tracks of Spotify playlist {playlist_id} at offset {offset}")
+            if tracks:
+                yield tracks
+            if not page.get('next'):
+                return
+            offset += PLAYLIST_PAGE_SIZE
 
     async def search(self, query: str, search_type: str, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
         """Search on Spotify"""
         try:
             logger.info(f"Searching Spotify - Type: {search_type}, Query: {query}, Limit: {limit}, Offset: {offset}")
             
-            results = self.sp.search(
-                q=query,
-                type=search_type,
-                limit=limit,
-                offset=offset
+            results = await spotify_api.get(
+                'search',
+                params={'q': query, 'type': search_type, 'limit': limit, 'offset': offset},
+                endpoint='search'
             )
             
             # Extract items based on search type
@@ -201,7 +353,7 @@ class SpotifyService:
             logger.info(f"Getting Spotify item info - Type: {item_type}, ID: {item_id}")
             
             if item_type == 'track':
-                track = self.sp.track(item_id)
+                track = await self._get_item('track', item_id)
                 # audio_features = self.sp.audio_features(item_id)[0]
                 info = {
                     'id': track['id'],
@@ -236,8 +388,8 @@ class SpotifyService:
                 return info
                 
             elif item_type == 'album':
-                album = self.sp.album(item_id)
-                tracks = self.sp.album_tracks(item_id)['items']
+                album = await self._get_item('album', item_id)
+                tracks = (await spotify_api.get(f"albums/{item_id}/tracks", params={'limit': 50}))['items']
                 info = {
                     'id': album['id'],
                     'name': album['name'],
@@ -267,7 +419,7 @@ class SpotifyService:
                 return info
                 
             elif item_type == 'playlist':
-                playlist = self.sp.playlist(item_id)
+                playlist = await spotify_api.get(f"playlists/{item_id}")
                 info = {
                     'id': playlist['id'],
                     'name': playlist['name'],
@@ -301,21 +453,15 @@ class SpotifyService:
                 return info
             
             elif item_type == 'artist':
-                artist = self.sp.artist(item_id)
-                try:
-                    top_tracks = self.sp.artist_top_tracks(item_id, country='US')['tracks']
-                except:
-                    top_tracks = None
-                try:
-                    albums = self.sp.artist_albums(item_id, album_type='album')['items']
-                except:
-                    albums = None
-                                
-                try:
-                    related_artists = self.sp.artist_related_artists(item_id)['artists']
-                except:
-                    related_artists = None
-                            
+                # The artist and the first page of each section load at once, so the card
+                # waits only for the slowest request; cached parts cost no request at all
+                artist, top_tracks, albums, related_artists = await asyncio.gather(
+                    asyncio.wait_for(self._get_artist(item_id), ARTIST_SECTION_TIMEOUT),
+                    self._artist_section(item_id, 'top_tracks'),
+                    self._artist_section(item_id, 'album'),
+                    self._artist_section(item_id, 'related')
+                )
+
                 artist_info = {
                     'id': artist['id'],
                     'name': artist['name'],
@@ -326,69 +472,21 @@ class SpotifyService:
                     'url': artist['external_urls']['spotify'],
                     'type': 'artist'
                 }
-                
-                if top_tracks:
-                    top_tracks_info = [
-                        {
-                            'id': track['id'],
-                            'name': track['name'],
-                            'artist': artist['name'],
-                            'popularity': track['popularity'],
-                            'preview_url': track['preview_url'],
-                            'album': track['album']['name'],
-                            'image': track['album']['images'][0]['url'] if track['album']['images'] else None,
-                            'url': track['external_urls']['spotify']
-                        }
-                        for track in top_tracks
-                    ]
-                else:
-                    top_tracks_info = None
 
-                if albums:
-                    albums_info = [
-                        {
-                            'id': album['id'],
-                            'name': album['name'],
-                            'artist': artist['name'],
-                            'release_date': album['release_date'],
-                            'total_tracks': album['total_tracks'],
-                            'image': album['images'][0]['url'] if album['images'] else None,
-                            'url': album['external_urls']['spotify']
-                        }
-                        for album in albums
-                    ]
-                else:
-                    albums_info = None
+                logger.info(f"Retrieved artist info for {artist_info['name']}")
 
-                if related_artists:
-                    related_info = [
-                        {
-                            'id': related['id'],
-                            'name': related['name'],
-                            'followers': related['followers']['total'],
-                            'genres': related['genres'],
-                            'popularity': related['popularity'],
-                            'image': related['images'][0]['url'] if related['images'] else None,
-                            'url': related['external_urls']['spotify']
-                        }
-                        for related in related_artists
-                    ]
-                else:
-                    related_info = None
-
-                logger.info(f"Retrieved full artist info for {artist_info['name']}")
-                
+                # Sections hold their first page only; it tells the view which buttons to show
                 artist_info.update({
                     'more_artist_info': {
-                        'top_tracks': top_tracks_info,
-                        'albums': albums_info,
-                        'related_artists': related_info
+                        'top_tracks': top_tracks,
+                        'albums': albums,
+                        'related_artists': related_artists
                     }
                 })
                 
                 return artist_info
             elif item_type == 'related':
-                related_artists = self.sp.artist_related_artists(item_id)['artists']
+                related_artists = (await self.artist_related_artists(item_id))['artists']
                 info = [
                     {
                         'id': artist['id'],
@@ -412,6 +510,119 @@ class SpotifyService:
             logger.error(f"Error getting {item_type} info for {item_id}: {str(e)}", exc_info=True)
             return None
 
+    async def _get_artist(self, artist_id: str) -> Dict[str, Any]:
+        """Get an artist object through the artist section cache"""
+        key = (artist_id, 'artist')
+        artist = artist_section_cache.get(key)
+        if artist is None:
+            artist = await self._get_item('artist', artist_id)
+            artist_section_cache.set(key, artist)
+        return artist
+
+    def get_cached_artist_name(self, artist_id: str) -> Optional[str]:
+        """Name of an artist whose card was loaded recently, without a request"""
+        artist = artist_section_cache.get((artist_id, 'artist'))
+        return artist['name'] if artist else None
+
+    async def _artist_section(self, artist_id: str, section: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the first page of one optional section of an artist card
+
+        Returns:
+            list: Items of the page, None if the call failed or timed out
+        """
+        try:
+            page = await asyncio.wait_for(self.get_artist_section(artist_id, section), ARTIST_SECTION_TIMEOUT)
+            return page['items']
+        except Exception as e:
+            logger.warning(f"Leaving {section} out of artist {artist_id}: {type(e).__name__} {str(e)}")
+            return None
+
+    async def get_artist_section(self, artist_id: str, section: str, page: int = 1) -> Dict[str, Any]:
+        """
+        Get one page of an artist card section, loading it on first use
+
+        Top tracks and related artists come in a single short response that is
+        cached whole; albums are requested and cached one page at a time. A page
+        costs one Spotify request at most, none when it is cached.
+
+        Args:
+            artist_id (str): Spotify ID of the artist
+            section (str): 'top_tracks', 'album' or 'related'
+            page (int): 1-based page of ARTIST_SECTION_PAGE_SIZE items
+
+        Returns:
+            dict: {'items': [...], 'has_more': bool}
+        """
+        if section not in ARTIST_SECTIONS:
+            raise ValueError(f"Unknown artist section: {section}")
+
+        key = (artist_id, section, page) if section == 'album' else (artist_id, section)
+        data = artist_section_cache.get(key)
+        if data is None:
+            data = await artist_section_flights.do(key, self._load_artist_section, key)
+        if section == 'album':
+            # A copy, so callers can add to it without touching the cached page
+            return dict(data)
+
+        start = (page - 1) * ARTIST_SECTION_PAGE_SIZE
+        end = start + ARTIST_SECTION_PAGE_SIZE
+        return {'items': data[start:end], 'has_more': len(data) > end}
+
+    async def _load_artist_section(self, key: Tuple) -> Any:
+        """Request one artist section (or album page) from Spotify and cache it"""
+        artist_id, section = key[0], key[1]
+        logger.info(f"Loading {section} of artist {artist_id}")
+        if section == 'top_tracks':
+            data = [
+                {
+                    'id': track['id'],
+                    'name': track['name'],
+                    'artist': track['artists'][0]['name'],
+                    'popularity': track['popularity'],
+                    'preview_url': track['preview_url'],
+                    'album': track['album']['name'],
+                    'image': track['album']['images'][0]['url'] if track['album']['images'] else None,
+                    'url': track['external_urls']['spotify']
+                }
+                for track in (await self.artist_top_tracks(artist_id))['tracks']
+            ]
+        elif section == 'related':
+            data = [
+                {
+                    'id': related['id'],
+                    'name': related['name'],
+                    'followers': related['followers']['total'],
+                    'genres': related['genres'],
+                    'popularity': related['popularity'],
+                    'image': related['images'][0]['url'] if related['images'] else None,
+                    'url': related['external_urls']['spotify']
+                }
+                for related in (await self.artist_related_artists(artist_id))['artists']
+            ]
+        else:
+            page = key[2]
+            response = await self.artist_albums(
+                artist_id, limit=ARTIST_SECTION_PAGE_SIZE, offset=(page - 1) * ARTIST_SECTION_PAGE_SIZE
+            )
+            data = {
+                'items': [
+                    {
+                        'id': album['id'],
+                        'name': album['name'],
+                        'artist': album['artists'][0]['name'],
+                        'release_date': album['release_date'],
+                        'total_tracks': album['total_tracks'],
+                        'image': album['images'][0]['url'] if album['images'] else None,
+                        'url': album['external_urls']['spotify']
+                    }
+                    for album in response['items']
+                ],
+                'has_more': bool(response.get('next'))
+            }
+        artist_section_cache.set(key, data)
+        return data
+
     def _format_duration(self, ms: int) -> str:
         """Format milliseconds to MM:SS format"""
         seconds = ms // 1000
@@ -0,0 +1,200 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class AudioCache:
+    """Size-bounded, content-addressed on-disk cache of downloaded audio
+
+    Entries are keyed by (deezer_id, quality) and point at objects named by
+    the SHA-256 of their content, so identical files are stored once. When the
+    total size goes over max_bytes the least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        """
+        Initialize the cache and load its index from disk
+
+        Args:
+            cache_dir (str): Directory holding the objects and index.json
+            max_bytes (int): Byte budget for all cached objects (0 disables the cache)
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._object_sizes: Dict[str, int] = {}
+        self.total_bytes = 0
+        if self.enabled:
+            os.makedirs(self.objects_dir, exist_ok=True)
+            self._load_index()
+        logger.info(f"AudioCache initialized at {cache_dir} ({self.total_bytes}/{max_bytes} bytes, {len(self._entries)} entries)")
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def _key(deezer_id, quality: str) -> str:
+        return f"{int(deezer_id)}:{quality}"
+
+    def _object_path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}{ext}")
+
+    def _load_index(self):
+        """Load the index, dropping entries whose object disappeared"""
+        try:
+            if not os.path.exists(self.index_path):
+                return
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            for key, entry in sorted(entries.items(), key=lambda item: item[1].get('last_access', 0)):
+                if os.path.exists(entry['path']):
+                    self._entries[key] = entry
+                    self._object_sizes[entry['hash']] = entry['size']
+            self.total_bytes = sum(self._object_sizes.values())
+        except Exception as e:
+            logger.error(f"Failed to load audio cache index: {str(e)}", exc_info=True)
+
+    def _save_index(self):
+        """Write the index atomically"""
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def _hash_file(file_path: str) -> str:
+        sha256 = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    @staticmethod
+    def _link_or_copy(source: str, destination: str):
+        """Hard-link source to destination, copying when linking is not possible"""
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copyfile(source, destination)
+
+    def put(self, deezer_id, quality: str, file_path: str, **meta) -> bool:
+        """
+        Add a file to the cache (blocking: hashes and copies the file)
+
+        Args:
+            deezer_id: Deezer track ID
+            quality (str): Quality of the file
+            file_path (str): File to cache, left in place
+            **meta: Extra metadata returned with the file (e.g. title, artist)
+        """
+        if not self.enabled:
+            return False
+        try:
+            digest = self._hash_file(file_path)
+            object_path = self._object_path(digest, os.path.splitext(file_path)[1])
+            size = os.path.getsize(file_path)
+            with self._lock:
+                key = self._key(deezer_id, quality)
+                # Drop the old entry first so its object is freed unless something else uses it
+                if key in self._entries:
+                    self._remove_entry(key)
+                if not os.path.exists(object_path):
+                    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                    self._link_or_copy(file_path, object_path)
+                self._entries[key] = {
+                    'hash': digest,
+                    'path': object_path,
+                    'size': size,
+                    'last_access': time.time(),
+                    'meta': meta
+                }
+                if digest not in self._object_sizes:
+                    self._object_sizes[digest] = size
+                    self.total_bytes += size
+                self._evict()
+                self._save_index()
+            logger.info(f"Cached audio for {key} ({size} bytes, total {self.total_bytes}/{self.max_bytes})")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to cache audio {file_path}: {str(e)}", exc_info=True)
+            return False
+
+    def get(self, deezer_id, quality: str) -> Optional[Dict[str, Any]]:
+        """Get the cache entry for a track and mark it as recently used"""
+        if not self.enabled:
+            return None
+        key = self._key(deezer_id, quality)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not os.path.exists(entry['path']):
+                self._remove_entry(key)
+                return None
+            entry['last_access'] = time.time()
+            self._entries.move_to_end(key)
+            return dict(entry)
+
+    def checkout(self, deezer_id, quality: str, destination_dir: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Place a private copy of a cached file in destination_dir (blocking)
+
+        The caller owns the returned file and may delete it; the cached object
+        is not affected. Every checkout gets its own file name, so concurrent
+        checkouts of the same track never share a path.
+
+        Returns:
+            tuple: (file_path, meta), or (None, {}) on a cache miss
+        """
+        entry = self.get(deezer_id, quality)
+        if entry is None:
+            return None, {}
+        try:
+            os.makedirs(destination_dir, exist_ok=True)
+            ext = os.path.splitext(entry['path'])[1]
+            fd, destination = tempfile.mkstemp(prefix=f"{int(deezer_id)}_{quality}_", suffix=ext, dir=destination_dir)
+            os.close(fd)
+            # mkstemp only reserves the name; the placeholder is replaced by a link to the object
+            os.remove(destination)
+            self._link_or_copy(entry['path'], destination)
+            logger.info(f"Audio cache hit for {deezer_id} {quality}")
+            return destination, entry.get('meta', {})
+        except Exception as e:
+            logger.error(f"Failed to check out cached audio for {deezer_id} {quality}: {str(e)}", exc_info=True)
+            return None, {}
+
+    def _remove_entry(self, key: str):
+        """Remove an entry and its object if no other entry uses it (lock held)"""
+        entry = self._entries.pop(key)
+        digest = entry['hash']
+        if any(other['hash'] == digest for other in self._entries.values()):
+            return
+        self.total_bytes -= self._object_sizes.pop(digest, 0)
+        if os.path.exists(entry['path']):
+            os.remove(entry['path'])
+
+    def _evict(self):
+        """Evict least recently used entries until the cache fits its budget (lock held)"""
+        while self.total_bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            logger.info(f"Evicting {key} from audio cache")
+            self._remove_entry(key)
+
+
+# Shared by every FileHandler so all components see the same cache
+AUDIO_CACHE_DIR = os.getenv('AUDIO_CACHE_DIR', os.path.join('cache', 'audio'))
+AUDIO_CACHE_BYTES = int(os.getenv('AUDIO_CACHE_BYTES', str(2 * 1024 ** 3)))
+audio_cache = AudioCache(AUDIO_CACHE_DIR, AUDIO_CACHE_BYTES)
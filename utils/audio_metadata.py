@@ -0,0 +1,158 @@
+import os
+import struct
+from dataclasses import dataclass
+from typing import Optional
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Bytes scanned for the first MPEG frame after any ID3v2 tag
+MP3_SYNC_SEARCH_BYTES = 64 * 1024
+
+# Layer III bitrates (kbps) by bitrate index, for MPEG-1 and MPEG-2/2.5
+MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+}
+# Sample rates by version bits (0: MPEG-2.5, 2: MPEG-2, 3: MPEG-1) and sample rate index
+MP3_SAMPLE_RATES = {
+    0: [11025, 12000, 8000],
+    2: [22050, 24000, 16000],
+    3: [44100, 48000, 32000]
+}
+
+
+@dataclass
+class AudioInfo:
+    codec: str
+    duration: float
+    sample_rate: int
+    channels: int
+    bitrate: Optional[int] = None
+
+
+def read_audio_info(file_path: str) -> Optional[AudioInfo]:
+    """
+    Read codec, duration and stream parameters from FLAC STREAMINFO or MP3
+    frame headers (Xing/Info/VBRI for VBR files) without starting ffprobe
+
+    Returns:
+        AudioInfo: Parsed information, or None if the file is not a FLAC or
+        MPEG Layer III file this parser understands
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(10)
+            audio_start = 0
+            if head[:3] == b'ID3' and len(head) == 10:
+                # ID3v2 size is a 28-bit syncsafe integer, plus 10 bytes for a footer
+                size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+                audio_start = 10 + size + (10 if head[5] & 0x10 else 0)
+
+            f.seek(audio_start)
+            if f.read(4) == b'fLaC':
+                return _read_flac_streaminfo(f)
+
+            file_size = os.fstat(f.fileno()).st_size
+            return _read_mp3_info(f, audio_start, file_size)
+    except Exception as e:
+        logger.warning(f"Could not parse audio headers of {file_path}: {str(e)}")
+        return None
+
+
+def _read_flac_streaminfo(f) -> Optional[AudioInfo]:
+    """Parse the STREAMINFO block following the fLaC marker"""
+    header = f.read(4)
+    if len(header) < 4 or header[0] & 0x7F != 0:
+        return None
+    block = f.read(34)
+    if len(block) < 34:
+        return None
+
+    # 20 bits sample rate, 3 bits channels - 1, 5 bits bits-per-sample - 1, 36 bits total samples
+    packed = struct.unpack('>Q', block[10:18])[0]
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x07) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    if not sample_rate:
+        return None
+
+    duration = total_samples / sample_rate
+    return AudioInfo('flac', duration, sample_rate, channels)
+
+
+def _parse_mp3_header(header: bytes) -> Optional[dict]:
+    """Decode a 4-byte MPEG Layer III frame header"""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    # Version 1 is reserved; layer 1 is Layer III
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = MP3_BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][sample_rate_index]
+    padding = (header[2] >> 1) & 0x01
+    mono = (header[3] >> 6) == 3
+    return {
+        'mpeg1': mpeg1,
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'channels': 1 if mono else 2,
+        'samples_per_frame': 1152 if mpeg1 else 576,
+        'frame_length': (144 if mpeg1 else 72) * bitrate // sample_rate + padding,
+        # Side information sits between the header and a Xing/Info tag
+        'side_info': (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    }
+
+
+def _read_mp3_info(f, audio_start: int, file_size: int) -> Optional[AudioInfo]:
+    """Find the first valid frame and derive duration from a VBR tag or the bitrate"""
+    f.seek(audio_start)
+    data = f.read(MP3_SYNC_SEARCH_BYTES)
+    offset = data.find(b'\xff')
+    while 0 <= offset < len(data) - 4:
+        frame = _parse_mp3_header(data[offset:offset + 4])
+        if frame:
+            # A following frame header confirms a real sync and not stray 0xFF bytes
+            next_offset = offset + frame['frame_length']
+            if next_offset + 4 > len(data) or _parse_mp3_header(data[next_offset:next_offset + 4]):
+                break
+        offset = data.find(b'\xff', offset + 1)
+    else:
+        return None
+
+    frame_start = audio_start + offset
+    f.seek(frame_start)
+    first_frame = f.read(max(frame['frame_length'], 4 + 32 + 18))
+    samples_per_frame = frame['samples_per_frame']
+    sample_rate = frame['sample_rate']
+
+    frame_count = None
+    xing_offset = 4 + frame['side_info']
+    tag = first_frame[xing_offset:xing_offset + 4]
+    if tag in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', first_frame[xing_offset + 4:xing_offset + 8])[0]
+        if flags & 0x01:
+            frame_count = struct.unpack('>I', first_frame[xing_offset + 8:xing_offset + 12])[0]
+    elif first_frame[36:40] == b'VBRI':
+        frame_count = struct.unpack('>I', first_frame[50:54])[0]
+
+    if frame_count:
+        duration = frame_count * samples_per_frame / sample_rate
+        audio_bytes = file_size - frame_start
+        bitrate = int(audio_bytes * 8 / duration) if duration else frame['bitrate']
+    else:
+        # Constant bitrate: size of the audio data over the bitrate of the first frame
+        audio_bytes = file_size - frame_start
+        f.seek(max(file_size - 128, 0))
+        if f.read(3) == b'TAG':
+            audio_bytes -= 128
+        bitrate = frame['bitrate']
+        duration = audio_bytes * 8 / bitrate
+
+    return AudioInfo('mp3', duration, sample_rate, frame['channels'], bitrate)
@@ -0,0 +1,80 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ExecutorQueueFull(Exception):
+    """Raised when an executor already holds its maximum number of pending jobs"""
+
+
+class BlockingExecutor:
+    """Run blocking work off the asyncio event loop with bounded queueing"""
+
+    def __init__(self, name: str, max_workers: int = 4, max_queue: int = 100, use_processes: bool = False):
+        """
+        Initialize the executor
+
+        Args:
+            name (str): Name used in log messages
+            max_workers (int): Number of worker threads/processes
+            max_queue (int): Maximum number of jobs running or waiting; further submissions are rejected
+            use_processes (bool): Use a process pool instead of a thread pool (arguments must be picklable)
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.use_processes = use_processes
+        self._executor = None
+        self._pending = 0
+        logger.info(f"BlockingExecutor '{name}' configured (workers: {max_workers}, queue: {max_queue}, processes: {use_processes})")
+
+    def _get_executor(self):
+        """Create the underlying pool on first use"""
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+            logger.info(f"Started {self.name} executor with {self.max_workers} workers")
+        return self._executor
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs currently running or waiting for a worker"""
+        return self._pending
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run a blocking callable in the pool and await its result
+
+        Cancelling the awaiting task cancels the job if it has not started yet;
+        a job that is already running finishes in the background and its result is dropped.
+
+        Raises:
+            ExecutorQueueFull: If max_queue jobs are already pending
+        """
+        if self._pending >= self.max_queue:
+            logger.warning(f"{self.name} executor queue full ({self._pending}/{self.max_queue})")
+            raise ExecutorQueueFull(f"{self.name} executor queue is full, please try again later")
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            call = functools.partial(func, *args, **kwargs)
+            return await loop.run_in_executor(self._get_executor(), call)
+        except asyncio.CancelledError:
+            logger.info(f"Cancelled {self.name} job: {getattr(func, '__name__', func)}")
+            raise
+        finally:
+            self._pending -= 1
+
+    def shutdown(self, wait: bool = False):
+        """Shut down the pool, cancelling jobs that have not started"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+            logger.info(f"Shut down {self.name} executor")
@@ -1,19 +1,43 @@
 import os
 import shutil
 import asyncio
+import zipfile
+import functools
 import ffmpeg
-from typing import List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
 from .url_validator import sanitize_filename
+from .audio_cache import audio_cache
+from .audio_metadata import read_audio_info
+from .executor import BlockingExecutor
 from logger import get_logger
 
 logger = get_logger(__name__)
 
+# ffmpeg transcodes are CPU bound and run in their own worker processes
+TRANSCODE_WORKERS = int(os.getenv('TRANSCODE_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+transcode_executor = BlockingExecutor('transcode', max_workers=TRANSCODE_WORKERS, max_queue=50, use_processes=True)
+
+# MP3 bitrate of each Deezer quality that can be produced by transcoding
+QUALITY_BITRATES = {
+    'MP3_128': '128k',
+    'MP3_320': '320k'
+}
+
+
+def transcode_audio(source_path: str, output_path: str, bitrate: str) -> str:
+    """Encode source_path as an MP3 of the given bitrate, keeping its tags (runs in a worker process)"""
+    stream = ffmpeg.input(source_path)
+    stream = ffmpeg.output(stream, output_path, acodec='libmp3lame', audio_bitrate=bitrate, map_metadata=0)
+    ffmpeg.run(stream, overwrite_output=True, quiet=True)
+    return output_path
+
 class FileHandler:
     """Handle file operations for music downloads"""
     
     def __init__(self, temp_dir: str = 'temp'):
         """Initialize FileHandler with temporary directory path"""
         self.temp_dir = temp_dir
+        self.audio_cache = audio_cache
         self._ensure_temp_dir()
         logger.info(f"FileHandler initialized with temp directory: {temp_dir}")
 
@@ -51,6 +75,50 @@ class FileHandler:
             logger.error(f"Failed to save audio file {filename}: {str(e)}", exc_info=True)
             return False, str(e)
 
+    async def cache_audio(self, deezer_id, quality: str, file_path: str, **meta) -> bool:
+        """Store a downloaded track in the local audio cache, leaving the file in place"""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self.audio_cache.put, deezer_id, quality, file_path, **meta)
+        )
+
+    async def get_cached_audio(self, deezer_id, quality: str, destination_dir: str = None) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Get a private copy of a cached track
+
+        Returns:
+            tuple: (file_path, meta) that the caller may delete, or (None, {}) on a miss
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None, self.audio_cache.checkout, deezer_id, quality, destination_dir or self.temp_dir
+        )
+
+    async def transcode_to_quality(self, source_path: str, quality: str, output_path: str = None) -> Tuple[bool, str]:
+        """
+        Produce a lower quality MP3 of an audio file in the transcode process pool
+
+        Args:
+            source_path (str): FLAC or higher bitrate MP3 to encode from, left in place
+            quality (str): Target quality, a key of QUALITY_BITRATES
+            output_path (str): Where to write the MP3 (default: next to the source)
+
+        Returns:
+            tuple: (success, output_path or error message)
+        """
+        try:
+            bitrate = QUALITY_BITRATES[quality]
+            if not output_path:
+                output_path = f"{source_path.rsplit('.', 1)[0]}_{quality}.mp3"
+            logger.info(f"Transcoding {source_path} to {quality}")
+            await transcode_executor.run(transcode_audio, source_path, output_path, bitrate)
+            output_size = os.path.getsize(output_path)
+            logger.info(f"Audio transcoded successfully: {output_path} (Size: {output_size} bytes)")
+            return True, output_path
+        except Exception as e:
+            logger.error(f"Failed to transcode {source_path} to {quality}: {str(e)}", exc_info=True)
+            return False, str(e)
+
     def create_zip_archive(self, files: List[str], archive_name: str) -> Tuple[bool, str]:
         """Create ZIP archive from list of files"""
         try:
@@ -75,10 +143,83 @@ class FileHandler:
             logger.error(f"Failed to create ZIP archive {archive_name}: {str(e)}", exc_info=True)
             return False, str(e)
 
+    def build_zip_archive(self, files: List[Tuple[str, str]], archive_name: str) -> Tuple[bool, str]:
+        """Write a ZIP archive from (file_path, name_in_archive) pairs"""
+        try:
+            safe_archive_name = sanitize_filename(archive_name)
+            if not safe_archive_name.endswith('.zip'):
+                safe_archive_name += '.zip'
+            zip_path = os.path.join(self.temp_dir, safe_archive_name)
+            logger.info(f"Building ZIP archive: {safe_archive_name} with {len(files)} files")
+
+            # Audio is already compressed, so entries are stored as-is
+            with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_STORED) as archive:
+                for file_path, arcname in files:
+                    archive.write(file_path, arcname)
+
+            zip_size = os.path.getsize(zip_path)
+            logger.info(f"ZIP archive built successfully: {zip_path} (Size: {zip_size} bytes)")
+            return True, zip_path
+
+        except Exception as e:
+            logger.error(f"Failed to build ZIP archive {archive_name}: {str(e)}", exc_info=True)
+            return False, str(e)
+
+    def split_zip_archive(self, zip_path: str, max_volume_bytes: int) -> Tuple[bool, List[str]]:
+        """
+        Split a ZIP archive into self-contained volumes of at most max_volume_bytes
+
+        Each volume is a regular ZIP holding whole entries, so it can be opened
+        on its own. An entry larger than the budget gets a volume to itself.
+        The original archive is kept when it already fits.
+        """
+        try:
+            zip_size = os.path.getsize(zip_path)
+            if zip_size <= max_volume_bytes:
+                return True, [zip_path]
+
+            logger.info(f"Splitting ZIP archive {zip_path} ({zip_size} bytes) into volumes of {max_volume_bytes} bytes")
+            base_path = zip_path[:-4] if zip_path.endswith('.zip') else zip_path
+            volume_paths = []
+            with zipfile.ZipFile(zip_path) as source:
+                groups = []
+                group, group_size = [], 0
+                for entry in source.infolist():
+                    # Leave room for the local header and central directory record
+                    entry_size = entry.compress_size + 2 * len(entry.filename) + 128
+                    if group and group_size + entry_size > max_volume_bytes:
+                        groups.append(group)
+                        group, group_size = [], 0
+                    group.append(entry)
+                    group_size += entry_size
+                if group:
+                    groups.append(group)
+
+                for index, entries in enumerate(groups, 1):
+                    volume_path = f"{base_path}.part{index}.zip"
+                    with zipfile.ZipFile(volume_path, 'w', compression=zipfile.ZIP_STORED) as volume:
+                        for entry in entries:
+                            with source.open(entry) as src, volume.open(entry.filename, 'w') as dst:
+                                shutil.copyfileobj(src, dst, 1024 * 1024)
+                    volume_paths.append(volume_path)
+
+            os.remove(zip_path)
+            logger.info(f"Split {zip_path} into {len(volume_paths)} volumes")
+            return True, volume_paths
+
+        except Exception as e:
+            logger.error(f"Failed to split ZIP archive {zip_path}: {str(e)}", exc_info=True)
+            return False, str(e)
+
     def get_audio_duration(self, file_path: str) -> Optional[int]:
-        """Get audio file duration using ffmpeg"""
+        """Get audio file duration from its headers, using ffmpeg as a fallback"""
         try:
             logger.info(f"Getting duration for audio file: {file_path}")
+            info = read_audio_info(file_path)
+            if info:
+                logger.info(f"Audio duration: {info.duration} seconds")
+                return int(info.duration)
+
             probe = ffmpeg.probe(file_path)
             duration = float(probe['format']['duration'])
             logger.info(f"Audio duration: {duration} seconds")
@@ -150,8 +291,12 @@ class FileHandler:
         try:
             logger.info(f"Checking audio format for: {file_path}")
             # Get current format
-            probe = ffmpeg.probe(file_path)
-            current_format = probe['format']['format_name']
+            info = read_audio_info(file_path)
+            if info:
+                current_format = info.codec
+            else:
+                probe = ffmpeg.probe(file_path)
+                current_format = probe['format']['format_name']
             
             # If already in correct format, return original path
             if current_format.lower() == target_format.lower():
@@ -191,6 +336,11 @@ class FileHandler:
         """Check if file is a valid audio file"""
         try:
             logger.info(f"Validating audio file: {file_path}")
+            info = read_audio_info(file_path)
+            if info and info.duration > 0:
+                logger.info(f"Audio file validation result: valid ({info.codec})")
+                return True
+
             probe = ffmpeg.probe(file_path)
             is_valid = 'audio' in probe['streams'][0]['codec_type']
             logger.info(f"Audio file validation result: {'valid' if is_valid else 'invalid'}")
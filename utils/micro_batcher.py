@@ -0,0 +1,94 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class MicroBatcher:
+    """Collect single-key lookups for a short window and resolve them with one bulk call"""
+
+    def __init__(self, name: str, fetch: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+                 max_batch: int, window: float):
+        """
+        Initialize the batcher
+
+        Args:
+            name (str): Name used in log messages
+            fetch (Callable): Coroutine function taking a list of keys and returning results by key
+            max_batch (int): Most keys per bulk call; a full batch is sent without waiting
+            window (float): Seconds to wait for more keys after the first one arrives
+        """
+        self.name = name
+        self.fetch = fetch
+        self.max_batch = max_batch
+        self.window = window
+        self._pending: Dict[Hashable, List[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.keys = 0
+
+    async def load(self, key: Hashable) -> Any:
+        """
+        Get the result for one key through the next bulk call
+
+        Callers asking for the same key in the same window share one slot.
+
+        Returns:
+            Any: The result fetch returned for key, None if it returned nothing for it
+
+        Raises:
+            Exception: Whatever the bulk call raised
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(key, []).append(future)
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        """Send everything collected so far as one bulk call"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        # Keep a reference so the task is not garbage collected while running
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[Hashable, List[asyncio.Future]]):
+        self.batches += 1
+        self.keys += len(batch)
+        logger.info(f"Sending {self.name} batch of {len(batch)} keys")
+        try:
+            results = await self.fetch(list(batch))
+        except Exception as e:
+            logger.error(f"{self.name} batch of {len(batch)} keys failed: {str(e)}")
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for key, futures in batch.items():
+            for future in futures:
+                # Callers that were cancelled meanwhile already have a done future
+                if not future.done():
+                    future.set_result(results.get(key))
+
+    def stats(self) -> Dict[str, Any]:
+        """Number of bulk calls and keys sent through them"""
+        return {
+            'name': self.name,
+            'batches': self.batches,
+            'keys': self.keys,
+            'avg_batch': self.keys / self.batches if self.batches else 0.0,
+            'pending': len(self._pending)
+        }
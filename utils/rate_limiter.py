@@ -0,0 +1,163 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Requests per second and burst size of each bucket, keyed by host or "host:endpoint class"
+DEFAULT_RATE_LIMITS = {
+    # The public Deezer API allows 50 requests per 5 seconds
+    'api.deezer.com': (10.0, 50),
+    'api.deezer.com:search': (5.0, 10),
+    'api.spotify.com': (5.0, 20),
+    'api.spotify.com:search': (3.0, 10)
+}
+# Waits longer than this (seconds) are logged as warnings
+SLOW_WAIT_SECONDS = 1.0
+
+
+class TokenBucket:
+    """Async token bucket; callers wait in FIFO order for a token instead of failing"""
+
+    def __init__(self, name: str, rate: float, capacity: int):
+        """
+        Initialize a full bucket
+
+        Args:
+            name (str): Name used in log messages and reports
+            rate (float): Tokens added per second
+            capacity (int): Most tokens the bucket holds, i.e. the allowed burst
+        """
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self.acquired = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.waiting = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float):
+        """Hand out no tokens for the given time, e.g. after a 429 with Retry-After"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        logger.warning(f"Rate limit bucket {self.name} paused for {seconds:.1f}s")
+
+    async def acquire(self) -> float:
+        """
+        Wait for a token
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            # asyncio.Lock wakes waiters in arrival order, which keeps the queue fair
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    if now < self._paused_until:
+                        await asyncio.sleep(self._paused_until - now)
+                        continue
+                    self._refill()
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+
+        wait = time.monotonic() - started
+        self.acquired += 1
+        if wait > 0.001:
+            self.waited += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        if wait > SLOW_WAIT_SECONDS:
+            logger.warning(f"Waited {wait:.2f}s for rate limit bucket {self.name} ({self.waiting} still queued)")
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue wait statistics of the bucket"""
+        return {
+            'name': self.name,
+            'rate': self.rate,
+            'capacity': self.capacity,
+            'acquired': self.acquired,
+            'waited': self.waited,
+            'avg_wait': self.total_wait / self.waited if self.waited else 0.0,
+            'max_wait': self.max_wait,
+            'queued': self.waiting
+        }
+
+
+class RateLimiter:
+    """One token bucket per upstream host and, optionally, per endpoint class of that host"""
+
+    def __init__(self, limits: Dict[str, Tuple[float, int]], overrides: Optional[str] = None):
+        """
+        Initialize the buckets
+
+        Args:
+            limits (dict): (rate, burst) by "host" or "host:endpoint class"
+            overrides (str): Comma separated "key=rate/burst" entries replacing or adding limits,
+                e.g. "api.deezer.com=8/40,api.spotify.com:search=2/5"
+        """
+        limits = dict(limits)
+        limits.update(self._parse(overrides))
+        self._buckets = {key: TokenBucket(key, rate, burst) for key, (rate, burst) in limits.items()}
+        logger.info(f"RateLimiter initialized with buckets: {', '.join(sorted(self._buckets))}")
+
+    @staticmethod
+    def _parse(overrides: Optional[str]) -> Dict[str, Tuple[float, int]]:
+        limits = {}
+        for entry in (overrides or '').split(','):
+            if not entry.strip():
+                continue
+            try:
+                key, value = entry.split('=', 1)
+                rate, burst = value.split('/', 1)
+                limits[key.strip()] = (float(rate), int(burst))
+            except ValueError:
+                logger.error(f"Invalid rate limit entry ignored: {entry}")
+        return limits
+
+    def _buckets_for(self, host: str, endpoint: Optional[str]) -> List[TokenBucket]:
+        keys = [host] + ([f"{host}:{endpoint}"] if endpoint else [])
+        return [self._buckets[key] for key in keys if key in self._buckets]
+
+    async def wait(self, host: str, endpoint: str = None) -> float:
+        """
+        Wait until a request to host (and its endpoint class) may be sent
+
+        Returns:
+            float: Seconds spent waiting in total
+        """
+        waited = 0.0
+        for bucket in self._buckets_for(host, endpoint):
+            waited += await bucket.acquire()
+        return waited
+
+    def pause(self, host: str, seconds: float, endpoint: str = None):
+        """Stop sending requests to host for a while, e.g. when it answered 429"""
+        for bucket in self._buckets_for(host, endpoint):
+            bucket.pause(seconds)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Queue wait statistics of every bucket"""
+        return [bucket.stats() for bucket in self._buckets.values()]
+
+
+rate_limiter = RateLimiter(DEFAULT_RATE_LIMITS, os.getenv('RATE_LIMITS'))
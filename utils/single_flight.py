@@ -0,0 +1,89 @@
+import asyncio
+from typing import Any, Callable, Dict, Hashable, Optional
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class _Flight:
+    """A shared call and the number of callers holding its result"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.holders = 0
+
+
+class SingleFlight:
+    """Share one in-flight async call among concurrent callers using the same key"""
+
+    def __init__(self, name: str):
+        """
+        Initialize the registry
+
+        Args:
+            name (str): Name used in log messages
+        """
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Check whether a call for key is running or still held"""
+        return key in self._flights
+
+    async def acquire(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """
+        Join the call for key, starting func(*args, **kwargs) if none is running
+
+        The result stays registered until every caller that acquired it has
+        called release(), so late callers get it without a new call. If the
+        call raises, every waiter receives the exception and holds nothing.
+
+        Returns:
+            Any: The shared result of the call
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            logger.info(f"Starting {self.name} call for {key}")
+            flight = _Flight(asyncio.ensure_future(func(*args, **kwargs)))
+            self._flights[key] = flight
+        else:
+            logger.info(f"Joining in-flight {self.name} call for {key} ({flight.holders} holders)")
+
+        flight.holders += 1
+        try:
+            # Shield so one cancelled caller does not cancel the call for everyone
+            return await asyncio.shield(flight.task)
+        except BaseException:
+            self.release(key)
+            raise
+
+    def release(self, key: Hashable, cleanup: Optional[Callable[[Any], None]] = None):
+        """
+        Drop one holder of key
+
+        When the last holder leaves, the entry is removed and cleanup(result) is
+        called for a successful result. A call nobody waits for any more is cancelled.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            return
+
+        flight.holders -= 1
+        if flight.holders > 0:
+            return
+
+        del self._flights[key]
+        if not flight.task.done():
+            flight.task.cancel()
+            logger.info(f"Cancelled abandoned {self.name} call for {key}")
+        elif cleanup and not flight.task.cancelled() and flight.task.exception() is None:
+            try:
+                cleanup(flight.task.result())
+            except Exception as e:
+                logger.error(f"Cleanup failed for {self.name} call {key}: {str(e)}", exc_info=True)
+
+    async def do(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """Run func once for all concurrent callers with the same key and return its result"""
+        result = await self.acquire(key, func, *args, **kwargs)
+        self.release(key)
+        return result
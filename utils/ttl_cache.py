@@ -0,0 +1,60 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TTLCache:
+    """In-memory LRU cache whose entries also expire after a time to live"""
+
+    def __init__(self, name: str, max_entries: int, ttl: float):
+        """
+        Initialize an empty cache
+
+        Args:
+            name (str): Name used in log messages and stats
+            max_entries (int): Entries kept before the least recently used is evicted
+            ttl (float): Default seconds an entry stays valid
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a live entry and mark it as recently used, default if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store an entry for ttl seconds (the cache default when not given)"""
+        self._entries.pop(key, None)
+        self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """Drop an entry"""
+        self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit/miss counters of the cache"""
+        lookups = self.hits + self.misses
+        return {
+            'name': self.name,
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
@@ -1,6 +1,6 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 import json
-from typing import Tuple, Dict, Any, List
+from typing import Tuple, Dict, Any, List, Optional
 
 class MusicView:
     @staticmethod
@@ -315,15 +315,21 @@ class MusicView:
         
         return header + "\n".join(track_list)
     @staticmethod
-    def get_list_keyboard(items: List[Dict[str, Any]], content_type: str, action: str, page: int = 1, spoid = 1) -> InlineKeyboardMarkup:
+    def get_list_keyboard(items: List[Dict[str, Any]], content_type: str, action: str, page: int = 1, spoid = 1,
+                          has_more: Optional[bool] = None) -> InlineKeyboardMarkup:
+        """
+        Create a paged list keyboard, 8 items per page
+
+        items is the whole list, or only the items of this page when has_more is given
+        """
         buttons = []
-        i = 0
         select_acrion = action
         if action == 'top_tracks':
             select_acrion = 'track'
+        if has_more is None:
+            has_more = len(items) > page * 8
+            items = items[(page-1)*8:page*8]
         for item in items:
-            if i < (page-1)*8 :
-                continue
             if action == 'related':
                 button_text = f"{item['name']}"
             else:
@@ -331,10 +337,6 @@ class MusicView:
             
             callback_data = f"select:{select_acrion}:{item['id']}"
             buttons.append([InlineKeyboardButton(text=button_text, callback_data=callback_data)])
-            i+=1
-            if i > (page)*8:
-                break
-        remaining_items = len(items) - (page)*8
         nav_buttons = []
         if page > 1:
             nav_buttons.append(
@@ -352,7 +354,7 @@ class MusicView:
         )
         
         
-        if remaining_items > 0:
+        if has_more:
             nav_buttons.append(
                 InlineKeyboardButton(
                     text="Next ➡️",
@@ -91,7 +91,6 @@ class PlaylistView:
         error_messages = {
             'invalid_url': "❌ Invalid link. Please provide a valid Deezer or Spotify link.",
             'download_failed': "❌ Download failed. Please try again or use a different link.",
-            'spotify_playlist': "Spotify playlists are not supported yet. Please use a Deezer link.",
             'settings_error': "Error accessing settings. Please try again later.",
             'history_error': "Error retrieving download history.",
             'general_error': "An error occurred. Please try again later."